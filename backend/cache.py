@@ -0,0 +1,108 @@
+"""Response cache backends for the Personal Finance API.
+
+Cached entries are keyed by request and by a generation counter that every
+write bumps, so invalidation is a single increment rather than a key scan.
+Generations are kept per namespace (one per tenant), and keys for a
+namespace start with "<namespace>:", so one tenant's writes leave the
+others' entries alone.
+
+The in-process LRU is the default; a Redis-compatible store can be used
+instead by setting RESPONSE_CACHE_URL (requires the `redis` package).
+"""
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ResponseCache(ABC):
+    """Interface shared by cache backends."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        ...
+
+    @abstractmethod
+    async def generation(self, namespace: str = "") -> int:
+        ...
+
+    @abstractmethod
+    async def bump_generation(self, namespace: str = "") -> int:
+        ...
+
+    async def close(self):
+        pass
+
+
+class MemoryCache(ResponseCache):
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def generation(self, namespace=""):
+        return self._generations.get(namespace, 0)
+
+    async def bump_generation(self, namespace=""):
+        generation = self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        # The namespace's older entries can never be hit again
+        prefix = namespace + ":"
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+        return generation
+
+
+class RedisCache(ResponseCache):
+    """Redis-compatible backend; the generation counter is shared by all workers."""
+
+    GENERATION_KEY = "finance:cache:generation"
+
+    def __init__(self, url: str, prefix: str = "finance:cache:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+
+    async def get(self, key):
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key, value, ttl):
+        await self._redis.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def generation(self, namespace=""):
+        return int(await self._redis.get(f"{self.GENERATION_KEY}:{namespace}") or 0)
+
+    async def bump_generation(self, namespace=""):
+        return await self._redis.incr(f"{self.GENERATION_KEY}:{namespace}")
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_cache(url: Optional[str] = None, max_entries: int = 256) -> ResponseCache:
+    if url:
+        return RedisCache(url)
+    return MemoryCache(max_entries)
@@ -0,0 +1,107 @@
+"""In-process change feed published by the API's write handlers.
+
+Every mutation pushes a small event (entity, op, id, the affected document
+and any account balances it changed) to all connected subscribers, which
+the `/api/events` endpoint streams as server-sent events. Events carry a
+sequence number; the last few hundred are kept so a reconnecting browser
+can resume from its `Last-Event-ID` instead of refetching. Subscribers
+that fall behind or ask for an id that has been evicted get a `resync`
+event telling them to reload their lists.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Set, Tuple
+
+Event = Tuple[int, dict]
+
+
+class Subscription:
+    def __init__(self, start_id: int, max_pending: int):
+        self.start_id = start_id
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=max_pending)
+        self.lagged = False
+
+    def push(self, event: Event):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Stop queueing; the stream sends one resync and the client reloads
+            self.lagged = True
+
+
+class ChangeFeed:
+    def __init__(self, history: int = 500, max_pending: int = 1000):
+        # Ids start from the clock so ids from before a restart never match
+        self._seq = int(time.time() * 1000)
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._max_pending = max_pending
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def last_id(self) -> int:
+        return self._seq
+
+    def publish(self, payload: dict) -> int:
+        self._seq += 1
+        event = (self._seq, payload)
+        self._history.append(event)
+        for sub in self._subscribers:
+            sub.push(event)
+        return self._seq
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        # A resumed stream keeps its own id until the replayed events arrive
+        sub = Subscription(self._seq if last_event_id is None else last_event_id, self._max_pending)
+        if last_event_id is not None and last_event_id != self._seq:
+            missed = self.replay(last_event_id) if last_event_id < self._seq else None
+            if missed is None:
+                sub.lagged = True
+            else:
+                for event in missed:
+                    sub.push(event)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def replay(self, after: int) -> Optional[List[Event]]:
+        """Events newer than `after`, or None if some were already evicted."""
+        if not self._history or self._history[0][0] > after + 1:
+            return None
+        return [event for event in self._history if event[0] > after]
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+
+def format_sse(event_id: Optional[int], payload: dict, encode: Callable[[dict], bytes]) -> bytes:
+    head = f"id: {event_id}\n".encode() if event_id is not None else b""
+    return head + b"data: " + encode(payload) + b"\n\n"
+
+
+async def stream(feed: ChangeFeed, sub: Subscription, encode: Callable[[dict], bytes], heartbeat: float):
+    """Yield SSE frames for one subscriber until the client goes away."""
+    try:
+        # Tell EventSource how long to wait before reconnecting, and give it
+        # an id to resume from even if no change arrives before a drop
+        yield b"retry: 3000\n\n"
+        if not sub.lagged:
+            yield format_sse(sub.start_id, {"op": "ready"}, encode)
+        while True:
+            if sub.lagged:
+                yield format_sse(feed.last_id, {"op": "resync"}, encode)
+                return
+            try:
+                event_id, payload = await asyncio.wait_for(sub.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield b": keep-alive\n\n"
+                continue
+            yield format_sse(event_id, payload, encode)
+    finally:
+        feed.unsubscribe(sub)
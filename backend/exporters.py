@@ -0,0 +1,85 @@
+"""Streaming file writers for report exports.
+
+Each writer consumes an async iterator of row dicts and yields encoded
+chunks, so an export never holds more than one batch of rows in memory.
+XLSX needs the optional XlsxWriter package; its rows are spooled to a
+temporary file in constant-memory mode and streamed back from disk.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from typing import AsyncIterator, List, Tuple
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FLUSH_ROWS = 500
+FILE_CHUNK = 64 * 1024
+
+Columns = List[Tuple[str, str]]
+
+
+async def write_csv(rows: AsyncIterator[dict], columns: Columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so spreadsheet apps detect UTF-8 Persian text
+    buffer.write("\ufeff")
+    writer.writerow([title for _, title in columns])
+    count = 0
+    async for row in rows:
+        writer.writerow([row.get(key, "") for key, _ in columns])
+        count += 1
+        if count % FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def write_ndjson(rows: AsyncIterator[dict], columns: Columns):
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps({key: row.get(key) for key, _ in columns}, ensure_ascii=False, default=str))
+        if len(lines) >= FLUSH_ROWS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def write_xlsx(rows: AsyncIterator[dict], columns: Columns):
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        sheet = workbook.add_worksheet()
+        sheet.right_to_left()
+        sheet.write_row(0, 0, [title for _, title in columns])
+        row_index = 1
+        async for row in rows:
+            sheet.write_row(row_index, 0, [row.get(key) for key, _ in columns])
+            row_index += 1
+        workbook.close()
+        with open(path, "rb") as f:
+            while chunk := f.read(FILE_CHUNK):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+WRITERS = {"csv": write_csv, "ndjson": write_ndjson, "xlsx": write_xlsx}
+
+
+def xlsx_available() -> bool:
+    try:
+        import xlsxwriter  # noqa: F401
+    except ImportError:
+        return False
+    return True
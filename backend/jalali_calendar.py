@@ -0,0 +1,105 @@
+"""Jalali calendar helpers shared by the API, imports and reports.
+
+Conversions are memoized at day granularity: a finance dataset touches a
+few thousand distinct days at most, so after warm-up every conversion is a
+dict lookup instead of a jdatetime construction. Month boundaries are
+served from the same caches.
+"""
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import jdatetime
+
+_DATE_RE = re.compile(r"^\s*(\d{4})/(\d{1,2})/(\d{1,2})\s*$")
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+
+class JalaliDateError(ValueError):
+    """Raised for strings that are not a valid YYYY/MM/DD Jalali date."""
+
+
+@lru_cache(maxsize=8192)
+def _jalali_to_gregorian(year: int, month: int, day: int) -> datetime:
+    try:
+        return jdatetime.datetime(year, month, day).togregorian()
+    except ValueError:
+        raise JalaliDateError(f"تاریخ نامعتبر: {year:04d}/{month:02d}/{day:02d}")
+
+
+@lru_cache(maxsize=8192)
+def _gregorian_to_jalali(day: date) -> str:
+    return jdatetime.date.fromgregorian(date=day).strftime("%Y/%m/%d")
+
+
+@lru_cache(maxsize=8192)
+def parse(jalali_str: str) -> Tuple[int, int, int]:
+    """Split a YYYY/MM/DD string (Persian or Latin digits) into integers."""
+    match = _DATE_RE.match(jalali_str.translate(_DIGITS)) if isinstance(jalali_str, str) else None
+    if not match:
+        raise JalaliDateError(f"قالب تاریخ باید YYYY/MM/DD باشد: {jalali_str}")
+    return int(match.group(1)), int(match.group(2)), int(match.group(3))
+
+
+def normalize(jalali_str: str) -> str:
+    """Canonical zero-padded YYYY/MM/DD form; raises JalaliDateError if invalid."""
+    year, month, day = parse(jalali_str)
+    _jalali_to_gregorian(year, month, day)
+    return f"{year:04d}/{month:02d}/{day:02d}"
+
+
+def from_jalali(jalali_str: str) -> datetime:
+    return _jalali_to_gregorian(*parse(jalali_str))
+
+
+def to_jalali(dt: datetime) -> str:
+    return _gregorian_to_jalali(dt.date() if isinstance(dt, datetime) else dt)
+
+
+def month_key(dt: datetime) -> str:
+    """Jalali YYYY/MM of a Gregorian datetime."""
+    return to_jalali(dt)[:7]
+
+
+def from_jalali_many(values: Iterable[str]) -> Dict[str, object]:
+    """Convert many Jalali strings at once.
+
+    Returns a mapping from each distinct input to its datetime, or to the
+    JalaliDateError it raised, so callers can report bad rows individually.
+    """
+    result = {}
+    for value in set(values):
+        try:
+            result[value] = from_jalali(value)
+        except JalaliDateError as e:
+            result[value] = e
+    return result
+
+
+def to_jalali_many(values: Iterable[datetime]) -> List[str]:
+    return [to_jalali(dt) for dt in values]
+
+
+@lru_cache(maxsize=4096)
+def month_start(year: int, month: int) -> datetime:
+    """Gregorian datetime of the first day of a Jalali month; month may overflow."""
+    index = year * 12 + (month - 1)
+    return _jalali_to_gregorian(index // 12, index % 12 + 1, 1)
+
+
+@lru_cache(maxsize=64)
+def month_window(year: int, month: int, months: int):
+    """Labels, YYYY/MM keys and months + 1 Gregorian boundaries for the
+    `months` Jalali months ending at year/month."""
+    labels = []
+    keys = []
+    boundaries = []
+    last = year * 12 + (month - 1)
+    for index in range(last - months + 1, last + 2):
+        y, m = index // 12, index % 12 + 1
+        boundaries.append(month_start(y, m))
+        if index <= last:
+            labels.append(jdatetime.date(y, m, 1).strftime("%B"))
+            keys.append(f"{y:04d}/{m:02d}")
+    return tuple(labels), tuple(keys), tuple(boundaries)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Maintenance commands for the Personal Finance backend.
+
+Usage:
+    python manage.py reconcile-balances [--dry-run]
+    python manage.py ensure-indexes
+    python manage.py explain
+    python manage.py rebuild-rollups
+    python manage.py rebuild-search
+    python manage.py materialize-recurring
+    python manage.py snapshot [--full]
+    python manage.py assign-tenant TENANT_ID
+    python manage.py shard-collections
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+import server
+
+
+async def cmd_reconcile_balances(args):
+    drift = await server.reconcile_balances(fix=not args.dry_run)
+    for row in drift:
+        print(json.dumps(row, ensure_ascii=False))
+    action = "reported" if args.dry_run else "fixed"
+    print(f"{len(drift)} account balance(s) drifted ({action})", file=sys.stderr)
+    return 1 if drift and args.dry_run else 0
+
+
+async def cmd_ensure_indexes(args):
+    await server.ensure_indexes()
+    for col_name, indexes in server.INDEXES.items():
+        for index in indexes:
+            print(f"{col_name}.{index.document['name']}")
+    return 0
+
+
+async def cmd_explain(args):
+    report = await server.explain_queries()
+    for row in report:
+        flag = "COLLSCAN" if row["collscan"] else "ok"
+        print(f"{flag:8} {row['query']:28} {' > '.join(row['stages'])}")
+    return 1 if any(row["collscan"] for row in report) else 0
+
+
+async def cmd_rebuild_rollups(args):
+    count = await server.rebuild_rollups()
+    print(f"{count} monthly rollup(s) rebuilt", file=sys.stderr)
+    return 0
+
+
+async def cmd_rebuild_search(args):
+    count = await server.rebuild_search_terms()
+    print(f"{count} transaction(s) reindexed for search", file=sys.stderr)
+    return 0
+
+
+async def cmd_materialize_recurring(args):
+    count = await server.materialize_recurring()
+    print(f"{count} recurring transaction(s) created", file=sys.stderr)
+    return 0
+
+
+async def cmd_snapshot(args):
+    results = await server.run_snapshots(full=args.full)
+    for tenant_id, counts in results.items():
+        print(json.dumps({"tenant": tenant_id, **counts}, ensure_ascii=False))
+    print(f"{len(results)} tenant snapshot(s) written to {server.SNAPSHOT_DIR}", file=sys.stderr)
+    return 0
+
+
+async def cmd_assign_tenant(args):
+    counts = await server.assign_tenant(args.tenant_id)
+    for col_name, count in counts.items():
+        print(f"{col_name}: {count}")
+    print(f"untenanted documents assigned to {args.tenant_id}", file=sys.stderr)
+    return 0
+
+
+async def cmd_shard_collections(args):
+    for col_name in await server.shard_collections():
+        print(f"{col_name}: {server.SHARD_KEYS[col_name]}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Personal Finance maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("reconcile-balances", help="Recompute account balances from transactions and report drift")
+    p.add_argument("--dry-run", action="store_true", help="Report drift without rewriting stored balances")
+    p.set_defaults(func=cmd_reconcile_balances)
+
+    p = sub.add_parser("ensure-indexes", help="Create the declared indexes (idempotent)")
+    p.set_defaults(func=cmd_ensure_indexes)
+
+    p = sub.add_parser("explain", help="Explain endpoint queries and fail on any COLLSCAN")
+    p.set_defaults(func=cmd_explain)
+
+    p = sub.add_parser("rebuild-rollups", help="Recompute monthly rollups from raw transactions")
+    p.set_defaults(func=cmd_rebuild_rollups)
+
+    p = sub.add_parser("rebuild-search", help="Recompute transaction search terms")
+    p.set_defaults(func=cmd_rebuild_search)
+
+    p = sub.add_parser("materialize-recurring", help="Create transactions for recurring rules that are due")
+    p.set_defaults(func=cmd_materialize_recurring)
+
+    p = sub.add_parser("snapshot", help="Export changed data to the Parquet analytics snapshot")
+    p.add_argument("--full", action="store_true", help="Rebuild every tenant's snapshot from scratch")
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser("assign-tenant", help="Give documents created before tenancy an owner")
+    p.add_argument("tenant_id")
+    p.set_defaults(func=cmd_assign_tenant)
+
+    p = sub.add_parser("shard-collections", help="Shard collections on tenant-leading keys (mongos only)")
+    p.set_defaults(func=cmd_shard_collections)
+
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args.func, args))
+
+
+async def run(func, args):
+    server.connect()
+    try:
+        return await func(args)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        server.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Per-request timing and MongoDB command instrumentation.
+
+A ContextVar carries the current request's RequestStats; Motor copies the
+context into its executor threads, so the pymongo CommandListener can
+attribute every command (and the documents it returned) to the request
+that issued it. Totals are kept per route and rendered in the Prometheus
+text format.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+current_stats: ContextVar[Optional["RequestStats"]] = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("started", "db_seconds", "commands", "documents")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.commands = 0
+        self.documents = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        return (
+            f"app;dur={self.elapsed() * 1000:.1f}, "
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.commands} commands, {self.documents} docs"'
+        )
+
+
+def _returned_documents(reply) -> int:
+    cursor = reply.get("cursor") if isinstance(reply, dict) else None
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    return 0
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Adds each command's duration and returned document count to the current request."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.db_seconds += event.duration_micros / 1e6
+            stats.documents += _returned_documents(event.reply)
+
+    def failed(self, event):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.db_seconds += event.duration_micros / 1e6
+
+
+class RouteMetrics:
+    __slots__ = ("requests", "errors", "seconds", "db_seconds", "commands", "documents", "buckets")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.commands = 0
+        self.documents = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+
+    def observe(self, method: str, route: str, status: int, stats: RequestStats):
+        elapsed = stats.elapsed()
+        with self._lock:
+            m = self._routes.setdefault((method, route), RouteMetrics())
+            m.requests += 1
+            m.errors += status >= 500
+            m.seconds += elapsed
+            m.db_seconds += stats.db_seconds
+            m.commands += stats.commands
+            m.documents += stats.documents
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    m.buckets[i] += 1
+
+    def render_prometheus(self) -> str:
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        with self._lock:
+            routes = sorted(self._routes.items())
+            labels = {key: f'method="{key[0]}",route="{key[1]}"' for key, _ in routes}
+
+            histogram = []
+            for key, m in routes:
+                for bound, count in zip(LATENCY_BUCKETS, m.buckets):
+                    histogram.append(f'finance_request_duration_seconds_bucket{{{labels[key]},le="{bound}"}} {count}')
+                histogram.append(f'finance_request_duration_seconds_bucket{{{labels[key]},le="+Inf"}} {m.requests}')
+                histogram.append(f"finance_request_duration_seconds_sum{{{labels[key]}}} {m.seconds:.6f}")
+                histogram.append(f"finance_request_duration_seconds_count{{{labels[key]}}} {m.requests}")
+            family("finance_request_duration_seconds", "histogram", "Request wall time", histogram)
+
+            for name, help_text, attr, fmt in (
+                ("finance_request_errors_total", "Requests that returned a 5xx status", "errors", "{}"),
+                ("finance_db_seconds_total", "Time spent in MongoDB commands", "db_seconds", "{:.6f}"),
+                ("finance_db_commands_total", "MongoDB commands issued", "commands", "{}"),
+                ("finance_db_documents_returned_total", "Documents returned by MongoDB cursors", "documents", "{}"),
+            ):
+                family(name, "counter", help_text, [
+                    f"{name}{{{labels[key]}}} {fmt.format(getattr(m, attr))}" for key, m in routes
+                ])
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
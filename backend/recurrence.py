@@ -0,0 +1,69 @@
+"""Occurrence dates for recurring transaction rules.
+
+A rule repeats every `interval` days, weeks, Jalali months or Jalali years
+from its start date. Monthly and yearly rules fall on `day_of_month`
+(defaulting to the start day), moved to the last day of shorter months, so
+"day 31" is the 30th in Mehr and the 29th or 30th in Esfand.
+
+Occurrences are produced lazily and computed directly from the rule, so
+starting after a watermark jumps straight to the next occurrence instead
+of walking the rule's history.
+"""
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+import jdatetime
+
+from jalali_calendar import from_jalali, parse, to_jalali
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+_DAYS = {"daily": 1, "weekly": 7}
+_MONTHS = {"monthly": 1, "yearly": 12}
+
+
+def month_length(year: int, month: int) -> int:
+    if month <= 6:
+        return 31
+    if month <= 11:
+        return 30
+    return 30 if jdatetime.date(year, 1, 1).isleap() else 29
+
+
+def _on_day(index: int, day: int) -> datetime:
+    year, month = index // 12, index % 12 + 1
+    return from_jalali(f"{year:04d}/{month:02d}/{min(day, month_length(year, month)):02d}")
+
+
+def occurrences(frequency: str, interval: int, start: datetime, day_of_month: Optional[int] = None,
+                after: Optional[datetime] = None, until: Optional[datetime] = None) -> Iterator[datetime]:
+    """Occurrence dates later than `after` and no later than `until` (unbounded if None)."""
+    if frequency in _DAYS:
+        step = timedelta(days=_DAYS[frequency] * interval)
+        k = 0 if after is None or after < start else (after - start) // step + 1
+        while True:
+            occurrence = start + k * step
+            if until is not None and occurrence > until:
+                return
+            yield occurrence
+            k += 1
+    elif frequency in _MONTHS:
+        step = _MONTHS[frequency] * interval
+        year, month, day = parse(to_jalali(start))
+        first = year * 12 + month - 1
+        day = day_of_month or day
+        k = 0
+        if after is not None:
+            after_year, after_month, _ = parse(to_jalali(after))
+            # At most one occurrence before the watermark's month is re-checked
+            k = max(0, (after_year * 12 + after_month - 1 - first) // step)
+        while True:
+            occurrence = _on_day(first + k * step, day)
+            k += 1
+            if occurrence < start or (after is not None and occurrence <= after):
+                continue
+            if until is not None and occurrence > until:
+                return
+            yield occurrence
+    else:
+        raise ValueError(f"unknown frequency: {frequency}")
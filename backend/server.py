@@ -1,14 +1,188 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from typing import Optional, List, Literal
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncio
+import base64
+import codecs
+import csv
+import hashlib
+import json
+import logging
 import os
-from pymongo import MongoClient
+import re
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson import ObjectId
 import jdatetime
+import heapq
+import orjson
 
-app = FastAPI(title="Personal Finance API", version="1.0.0")
+from cache import create_cache
+import events
+import exporters
+from metrics import CommandTimer, RequestStats, current_stats, registry
+import recurrence
+import snapshots
+import text_search
+from jalali_calendar import (
+    JalaliDateError, from_jalali, from_jalali_many, month_key, month_start, month_window, normalize, parse, to_jalali
+)
+
+logger = logging.getLogger("finance")
+
+# Database
+MONGO_URL = os.environ.get("MONGO_URL")
+DB_NAME = os.environ.get("DB_NAME", "personal_finance")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+
+# Response cache
+RESPONSE_CACHE_URL = os.environ.get("RESPONSE_CACHE_URL")
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+response_cache = create_cache(RESPONSE_CACHE_URL, RESPONSE_CACHE_SIZE)
+
+# Tenancy
+# The tenant (household) comes from a header set by the auth proxy in front
+# of the API; single-household deployments fall back to DEFAULT_TENANT.
+# Leave DEFAULT_TENANT empty to reject requests without the header.
+TENANT_HEADER = "X-Tenant-ID"
+DEFAULT_TENANT = os.environ.get("DEFAULT_TENANT", "default")
+TENANT_ID_RE = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+current_tenant: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+
+# Change feed
+EVENTS_HEARTBEAT = float(os.environ.get("EVENTS_HEARTBEAT", "15"))
+EVENTS_HISTORY = int(os.environ.get("EVENTS_HISTORY", "500"))
+change_feeds = {}
+
+def feed_for(tenant_id: str) -> events.ChangeFeed:
+    if tenant_id not in change_feeds:
+        change_feeds[tenant_id] = events.ChangeFeed(history=EVENTS_HISTORY)
+    return change_feeds[tenant_id]
+
+# Instrumentation
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+
+# Background jobs
+CHECK_SCHEDULER_INTERVAL = float(os.environ.get("CHECK_SCHEDULER_INTERVAL", "3600"))
+CHECK_SCHEDULER_BATCH = int(os.environ.get("CHECK_SCHEDULER_BATCH", "500"))
+PURGE_BATCH_SIZE = int(os.environ.get("PURGE_BATCH_SIZE", "1000"))
+RECURRING_SCHEDULER_INTERVAL = float(os.environ.get("RECURRING_SCHEDULER_INTERVAL", "3600"))
+RECURRING_BATCH_SIZE = int(os.environ.get("RECURRING_BATCH_SIZE", "500"))
+
+# Analytics snapshots
+# Disabled unless SNAPSHOT_DIR is set; needs pyarrow and pandas
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "")
+SNAPSHOT_INTERVAL = float(os.environ.get("SNAPSHOT_INTERVAL", "3600"))
+SNAPSHOT_BATCH_SIZE = int(os.environ.get("SNAPSHOT_BATCH_SIZE", "50000"))
+# Writes stamped earlier than this are assumed to have committed
+SNAPSHOT_SETTLE_SECONDS = float(os.environ.get("SNAPSHOT_SETTLE_SECONDS", "60"))
+snapshot_store = snapshots.SnapshotStore(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+
+# Batch writes
+BATCH_MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", "500"))
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", "86400"))
+background_tasks = set()
+
+def spawn(coro):
+    # Keep a reference so the task isn't garbage-collected mid-run
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Client and collections are bound by connect() when the app starts
+client = None
+db = None
+accounts_col = None
+transactions_col = None
+checks_col = None
+rollups_col = None
+rules_col = None
+deletions_col = None
+idempotency_col = None
+transactions_supported = None
+
+def connect():
+    global client, db, accounts_col, transactions_col, checks_col, rollups_col, rules_col
+    global deletions_col, idempotency_col, transactions_supported
+    client = AsyncIOMotorClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        event_listeners=[CommandTimer()],
+    )
+    db = client[DB_NAME]
+    accounts_col = db["accounts"]
+    transactions_col = db["transactions"]
+    checks_col = db["checks"]
+    rollups_col = db["monthly_rollups"]
+    rules_col = db["recurring_rules"]
+    deletions_col = db["deletions"]
+    idempotency_col = db["idempotency_keys"]
+    transactions_supported = None
+
+def disconnect():
+    if client is not None:
+        client.close()
+
+@asynccontextmanager
+async def lifespan(app):
+    connect()
+    await ensure_indexes()
+    # Documents from before tenancy belong to the default tenant; without
+    # one they stay hidden until `manage.py assign-tenant` is run
+    if DEFAULT_TENANT:
+        counts = await assign_tenant(DEFAULT_TENANT)
+        if any(counts.values()):
+            logger.info("assigned untenanted documents to %s: %s", DEFAULT_TENANT, counts)
+    await backfill_balances()
+    if CHECK_SCHEDULER_INTERVAL > 0:
+        spawn(check_scheduler())
+    if RECURRING_SCHEDULER_INTERVAL > 0:
+        spawn(recurring_scheduler())
+    if snapshots_enabled() and SNAPSHOT_INTERVAL > 0:
+        spawn(snapshot_scheduler())
+    elif snapshot_store is not None:
+        logger.warning("SNAPSHOT_DIR is set but pyarrow/pandas are not installed; snapshots are off")
+    await resume_purges()
+    yield
+    for task in list(background_tasks):
+        task.cancel()
+    await response_cache.close()
+    disconnect()
+
+def _json_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+def dump_json(content) -> bytes:
+    return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(Response):
+    """orjson-backed JSON response; handles datetime natively and ObjectId as str.
+
+    Listing endpoints return it directly so FastAPI skips jsonable_encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dump_json(content)
+
+app = FastAPI(
+    title="Personal Finance API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,33 +192,557 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database
-MONGO_URL = os.environ.get("MONGO_URL")
-DB_NAME = os.environ.get("DB_NAME", "personal_finance")
-client = MongoClient(MONGO_URL)
-db = client[DB_NAME]
+@app.middleware("http")
+async def invalidate_cache_on_write(request: Request, call_next):
+    response = await call_next(request)
+    # Any successful write may change cached aggregates
+    if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        await response_cache.bump_generation(tenant())
+    return response
+
+@app.middleware("http")
+async def record_timing(request: Request, call_next):
+    stats = RequestStats()
+    token = current_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        current_stats.reset(token)
+    # Label by route template so ids don't explode metric cardinality
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    registry.observe(request.method, route, response.status_code, stats)
+    response.headers["Server-Timing"] = stats.server_timing()
+    if stats.elapsed() * 1000 > SLOW_REQUEST_MS:
+        logger.warning(
+            "slow request %s %s: %.0f ms, %d mongo commands (%.0f ms), %d docs",
+            request.method, route, stats.elapsed() * 1000, stats.commands, stats.db_seconds * 1000, stats.documents,
+        )
+    return response
+
+@app.middleware("http")
+async def bind_tenant(request: Request, call_next):
+    # Registered last so it wraps the other middleware, which need the tenant too
+    token = current_tenant.set(request.headers.get(TENANT_HEADER) or DEFAULT_TENANT)
+    try:
+        return await call_next(request)
+    finally:
+        current_tenant.reset(token)
+
+def tenant() -> str:
+    """Tenant of the current request or background task."""
+    value = current_tenant.get()
+    if not value:
+        raise HTTPException(status_code=401, detail="شناسه کاربر ارسال نشده")
+    if not TENANT_ID_RE.fullmatch(value):
+        raise HTTPException(status_code=400, detail="شناسه کاربر نامعتبر است")
+    return value
 
-# Collections
-accounts_col = db["accounts"]
-transactions_col = db["transactions"]
-checks_col = db["checks"]
+def scoped(query: Optional[dict] = None) -> dict:
+    """Restrict a filter, or stamp a new document, with the current tenant."""
+    return {"tenant_id": tenant(), **(query or {})}
+
+# Indexes
+# Declared per collection; created idempotently on startup.
+# Every request filters on tenant_id first, so indexes lead with it and a
+# tenant's queries only touch its own key range. Listings sort on
+# (date, _id) for keyset pagination, so each equality filter gets a
+# compound index ending in that sort.
+INDEXES = {
+    "transactions": [
+        IndexModel([("tenant_id", 1), ("date", -1), ("_id", -1)], name="tenant_date_id"),
+        IndexModel([("tenant_id", 1), ("account_id", 1), ("date", -1), ("_id", -1)], name="tenant_account_date_id"),
+        IndexModel([("tenant_id", 1), ("type", 1), ("date", -1), ("_id", -1)], name="tenant_type_date_id"),
+        IndexModel([("tenant_id", 1), ("category", 1), ("date", -1), ("_id", -1)], name="tenant_category_date_id"),
+        # Multikey; `q=` searches are anchored-regex range scans on it
+        IndexModel([("tenant_id", 1), ("search_terms", 1), ("date", -1), ("_id", -1)], name="tenant_search_terms_date_id"),
+        # Finds a rule's stored occurrences; their _ids (see occurrence_id) keep them unique
+        IndexModel(
+            [("tenant_id", 1), ("recurring_id", 1), ("date", 1)],
+            name="tenant_recurring_id_date",
+            partialFilterExpression={"recurring_id": {"$exists": True}},
+        ),
+        # Incremental analytics snapshots read what changed since a watermark
+        IndexModel([("tenant_id", 1), ("updated_at", 1)], name="tenant_updated_at"),
+    ],
+    "checks": [
+        IndexModel([("tenant_id", 1), ("due_date", 1)], name="tenant_due_date"),
+        IndexModel([("tenant_id", 1), ("status", 1), ("due_date", 1)], name="tenant_status_due_date"),
+        IndexModel([("tenant_id", 1), ("account_id", 1), ("due_date", 1)], name="tenant_account_due_date"),
+        IndexModel([("tenant_id", 1), ("type", 1), ("due_date", 1)], name="tenant_type_due_date"),
+        IndexModel([("tenant_id", 1), ("overdue", 1), ("due_date", 1)], name="tenant_overdue_due_date"),
+        # The overdue scheduler scans across tenants
+        IndexModel([("status", 1), ("due_date", 1)], name="status_due_date"),
+        IndexModel([("overdue", 1), ("due_date", 1)], name="overdue_due_date"),
+        IndexModel([("tenant_id", 1), ("updated_at", 1)], name="tenant_updated_at"),
+    ],
+    "accounts": [
+        IndexModel([("tenant_id", 1), ("deleted_at", 1)], name="tenant_deleted_at"),
+        # Startup finds unfinished purges across tenants
+        IndexModel([("deleted_at", 1)], name="deleted_at", sparse=True),
+    ],
+    "monthly_rollups": [
+        IndexModel(
+            [("tenant_id", 1), ("month", 1), ("account_id", 1), ("type", 1), ("category", 1)],
+            name="tenant_month_account_type_category",
+            unique=True,
+        ),
+        IndexModel([("tenant_id", 1), ("account_id", 1)], name="tenant_account"),
+    ],
+    "recurring_rules": [
+        IndexModel([("tenant_id", 1), ("account_id", 1)], name="tenant_account"),
+        # The recurring scheduler finds due rules across tenants
+        IndexModel([("next_run", 1)], name="next_run", sparse=True),
+    ],
+    "deletions": [
+        IndexModel([("tenant_id", 1), ("collection", 1), ("deleted_at", 1)], name="tenant_collection_deleted_at"),
+    ],
+    "idempotency_keys": [
+        IndexModel([("created_at", 1)], name="created_at_ttl", expireAfterSeconds=IDEMPOTENCY_TTL),
+    ],
+}
+
+# Pre-tenancy indexes, dropped by ensure_indexes
+OBSOLETE_INDEXES = {
+    "transactions": [
+        "date_id", "account_date_id", "type_date_id", "category_date_id", "search_terms_date_id",
+        # Unique without the shard key as prefix, which a sharded collection rejects
+        "tenant_recurring_date",
+    ],
+    "checks": ["due_date", "account_due_date", "type_due_date"],
+    "monthly_rollups": ["month_account_type_category", "account"],
+}
+
+# Shard keys for `manage.py shard-collections`. Leading with tenant_id keeps
+# each household's documents on as few chunks as possible, and every
+# endpoint filter carries it, so queries target a single shard.
+SHARD_KEYS = {
+    "accounts": {"tenant_id": 1, "_id": 1},
+    "transactions": {"tenant_id": 1, "_id": 1},
+    "checks": {"tenant_id": 1, "_id": 1},
+    "recurring_rules": {"tenant_id": 1, "_id": 1},
+    "deletions": {"tenant_id": 1, "_id": 1},
+    # Unique indexes must start with the shard key
+    "monthly_rollups": {"tenant_id": 1, "month": 1},
+}
+
+# Representative endpoint queries checked by `manage.py explain`:
+# (name, collection, filter, sort)
+_SAMPLE_ID = "000000000000000000000000"
+_T = {"tenant_id": "default"}
+DIAGNOSTIC_QUERIES = [
+    ("transactions:list", "transactions", _T, [("date", -1), ("_id", -1)]),
+    ("transactions:account", "transactions", {**_T, "account_id": _SAMPLE_ID}, [("date", -1), ("_id", -1)]),
+    ("transactions:type", "transactions", {**_T, "type": "expense"}, [("date", -1), ("_id", -1)]),
+    ("transactions:category", "transactions", {**_T, "category": "سایر"}, [("date", -1), ("_id", -1)]),
+    ("transactions:date-range", "transactions", {**_T, "date": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}, None),
+    ("transactions:search", "transactions", {**_T, **text_search.match_all(["اجاره"])}, None),
+    ("checks:list", "checks", _T, [("due_date", 1)]),
+    ("checks:status", "checks", {**_T, "status": "pending"}, [("due_date", 1)]),
+    ("checks:account", "checks", {**_T, "account_id": _SAMPLE_ID}, [("due_date", 1)]),
+    ("checks:type", "checks", {**_T, "type": "received"}, [("due_date", 1)]),
+    ("checks:overdue", "checks", {**_T, "overdue": True}, [("due_date", 1)]),
+    ("checks:forecast", "checks", {**_T, "status": "pending", "due_date": {"$lt": datetime(2024, 1, 1)}}, [("due_date", 1)]),
+    ("checks:scheduler", "checks", {"status": "pending", "due_date": {"$lt": datetime(2024, 1, 1)}}, None),
+    ("recurring:list", "recurring_rules", _T, None),
+    ("recurring:scheduler", "recurring_rules", {"next_run": {"$lte": datetime(2024, 1, 1)}}, None),
+    ("accounts:list", "accounts", {**_T, "deleted_at": {"$exists": False}}, None),
+    ("rollups:month", "monthly_rollups", {**_T, "month": "1403/01"}, None),
+]
+
+async def ensure_indexes():
+    for col_name, indexes in INDEXES.items():
+        existing = await db[col_name].index_information()
+        for name in OBSOLETE_INDEXES.get(col_name, []):
+            if name in existing:
+                await db[col_name].drop_index(name)
+        await db[col_name].create_indexes(indexes)
+
+async def shard_collections() -> List[str]:
+    """Enable sharding with SHARD_KEYS; only works against a mongos router."""
+    await client.admin.command("enableSharding", DB_NAME)
+    sharded = []
+    for col_name, key in SHARD_KEYS.items():
+        await client.admin.command("shardCollection", f"{DB_NAME}.{col_name}", key=key)
+        sharded.append(col_name)
+    return sharded
+
+TENANT_COLLECTIONS = ("accounts", "transactions", "checks", "monthly_rollups", "recurring_rules")
+
+async def assign_tenant(tenant_id: str) -> dict:
+    """Stamp documents written before tenancy with `tenant_id`; returns counts."""
+    counts = {}
+    for col_name in TENANT_COLLECTIONS:
+        update = {"tenant_id": tenant_id}
+        if col_name in ("transactions", "checks"):
+            # So the next incremental snapshot picks them up
+            update["updated_at"] = datetime.now(timezone.utc)
+        result = await db[col_name].update_many({"tenant_id": {"$exists": False}}, {"$set": update})
+        counts[col_name] = result.modified_count
+    return counts
+
+async def require_tenanted():
+    """Refuse to go on while documents written before tenancy have no owner."""
+    for col_name in TENANT_COLLECTIONS:
+        if await db[col_name].find_one({"tenant_id": {"$exists": False}}, {"_id": 1}):
+            raise RuntimeError(f"{col_name} has documents without tenant_id; run `manage.py assign-tenant TENANT_ID` first")
+
+def _plan_stages(plan) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+async def explain_queries() -> List[dict]:
+    """Explain each diagnostic query and flag any that fall back to a COLLSCAN."""
+    report = []
+    for name, col_name, query, sort in DIAGNOSTIC_QUERIES:
+        cursor = db[col_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = (await cursor.explain()).get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning)
+        report.append({"query": name, "stages": stages, "collscan": "COLLSCAN" in stages})
+    return report
 
 # Helper functions
-def to_jalali(dt: datetime) -> str:
-    jd = jdatetime.datetime.fromgregorian(datetime=dt)
-    return jd.strftime("%Y/%m/%d")
+def parse_jalali_param(value: str, field: str) -> datetime:
+    try:
+        return from_jalali(value)
+    except JalaliDateError:
+        raise HTTPException(status_code=400, detail=f"تاریخ نامعتبر در {field}: {value}")
+
+def validate_jalali(value: Optional[str]) -> Optional[str]:
+    # Raises JalaliDateError (a ValueError), which pydantic reports as a 422
+    return normalize(value) if value is not None else None
 
-def from_jalali(jalali_str: str) -> datetime:
-    parts = jalali_str.split("/")
-    jd = jdatetime.datetime(int(parts[0]), int(parts[1]), int(parts[2]))
-    return jd.togregorian()
+def encode_cursor(date: datetime, oid: ObjectId, score: Optional[int] = None) -> str:
+    raw = f"{date.isoformat()}|{oid}" + (f"|{score}" if score is not None else "")
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def derived_id(*parts) -> ObjectId:
+    """The same ObjectId for the same parts, so a repeated insert hits a duplicate key."""
+    return ObjectId(hashlib.sha1(":".join(str(p) for p in parts).encode()).digest()[:12])
+
+def decode_cursor(cursor: str):
+    """(date, _id, score); score is None for cursors from unranked listings."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_str, oid, *score = raw.split("|")
+        return datetime.fromisoformat(date_str), ObjectId(oid), int(score[0]) if score else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="نشانگر صفحه نامعتبر است")
+
+async def cached_response(request: Request, compute) -> Response:
+    """Serve `compute()` from the response cache, with ETag revalidation."""
+    tenant_id = tenant()
+    generation = await response_cache.generation(tenant_id)
+    key = f"{tenant_id}:{generation}:{request.url.path}?{sorted(request.query_params.multi_items())}"
+    body = await response_cache.get(key)
+    if body is None:
+        body = dump_json(await compute())
+        await response_cache.set(key, body, RESPONSE_CACHE_TTL)
+    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def projection(fields: Optional[str], allowed: tuple, default: tuple, required: tuple) -> dict:
+    """Mongo projection for a `?fields=a,b` parameter, falling back to the lean default."""
+    names = default
+    if fields:
+        names = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in names if f not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"فیلد نامعتبر: {', '.join(unknown)}")
+    return {name: 1 for name in (*required, *names)}
+
+# Stored for queries only, never returned
+INTERNAL_FIELDS = ("tenant_id", "search_terms", "updated_at")
 
 def serialize_doc(doc):
     if doc is None:
         return None
     doc["id"] = str(doc.pop("_id"))
+    for field in INTERNAL_FIELDS:
+        doc.pop(field, None)
     return doc
 
+# Account metadata cache
+# Listings attach account/bank names to every row; names are resolved with
+# one `$in` query per request and kept here, keyed by (tenant, account),
+# until the account changes.
+account_meta_cache: dict = {}
+
+async def get_account_meta(account_ids) -> dict:
+    tenant_id = tenant()
+    missing = {a for a in account_ids if (tenant_id, a) not in account_meta_cache and ObjectId.is_valid(a)}
+    if missing:
+        async for acc in accounts_col.find(
+            scoped({"_id": {"$in": [ObjectId(a) for a in missing]}}),
+            {"account_name": 1, "bank_name": 1},
+        ):
+            account_meta_cache[(tenant_id, str(acc["_id"]))] = {
+                "account_name": acc.get("account_name", "نامشخص"),
+                "bank_name": acc.get("bank_name", "نامشخص"),
+            }
+    return {a: account_meta_cache[(tenant_id, a)] for a in account_ids if (tenant_id, a) in account_meta_cache}
+
+def invalidate_account_meta(account_id: str):
+    account_meta_cache.pop((tenant(), account_id), None)
+
+async def attach_account_info(docs: List[dict]) -> List[dict]:
+    meta = await get_account_meta({d["account_id"] for d in docs})
+    for d in docs:
+        d.update(meta.get(d["account_id"], {}))
+    return docs
+
+# Account deletion
+# Deleting an account only marks it with `deleted_at`; a background job then
+# removes its transactions and checks in batches and finally the account
+# itself. Until then every read treats the account as gone.
+ACTIVE = {"deleted_at": {"$exists": False}}
+
+async def purging_account_ids() -> List[str]:
+    return [str(acc["_id"]) async for acc in accounts_col.find(scoped({"deleted_at": {"$exists": True}}), {"_id": 1})]
+
+async def exclude_purging(query: dict) -> Optional[dict]:
+    """Scope a transactions/checks query to live accounts; None if nothing can match."""
+    purging = await purging_account_ids()
+    if not purging:
+        return query
+    if "account_id" in query:
+        return None if query["account_id"] in purging else query
+    return {**query, "account_id": {"$nin": purging}}
+
+async def purge_collection(col, account_id: str, field: str) -> int:
+    deleted = 0
+    while True:
+        ids = [doc["_id"] async for doc in col.find(scoped({"account_id": account_id}), {"_id": 1}).limit(PURGE_BATCH_SIZE)]
+        if not ids:
+            return deleted
+        result = await col.delete_many(scoped({"_id": {"$in": ids}}))
+        await record_deletions(col.name, ids)
+        deleted += result.deleted_count
+        await accounts_col.update_one(scoped({"_id": ObjectId(account_id)}), {"$inc": {f"purge.{field}": result.deleted_count}})
+
+async def purge_account(account_id: str, tenant_id: str):
+    """Remove a soft-deleted account's data batch by batch; safe to re-run after a crash."""
+    # Runs as its own task, so binding the tenant here doesn't leak elsewhere
+    current_tenant.set(tenant_id)
+    try:
+        await purge_collection(transactions_col, account_id, "transactions_deleted")
+        await purge_collection(checks_col, account_id, "checks_deleted")
+        await rollups_col.delete_many(scoped({"account_id": account_id}))
+        await rules_col.delete_many(scoped({"account_id": account_id}))
+        await accounts_col.delete_one(scoped({"_id": ObjectId(account_id)}))
+        invalidate_account_meta(account_id)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("purge of account %s failed; it will resume on next startup", account_id)
+
+async def resume_purges():
+    async for acc in accounts_col.find({"deleted_at": {"$exists": True}}, {"tenant_id": 1}):
+        spawn(purge_account(str(acc["_id"]), acc["tenant_id"]))
+
+# Balance ledger
+# Each account document carries a materialized `balance` that every
+# transaction write adjusts with `$inc`, so reads never rescan history.
+def signed_amount(txn_type: str, amount: int) -> int:
+    return amount if txn_type == "income" else -amount
+
+def signed_sum(field: str) -> dict:
+    """$sum of `field` with expenses negated."""
+    return {"$sum": {"$cond": [{"$eq": ["$type", "income"]}, field, {"$multiply": [field, -1]}]}}
+
+async def apply_balance_delta(account_id: str, delta: int, balances: Optional[dict] = None):
+    """Adjust one account's balance, recording its new value in `balances` if given."""
+    if delta:
+        acc = await accounts_col.find_one_and_update(
+            scoped({"_id": ObjectId(account_id)}), {"$inc": {"balance": delta}},
+            projection={"balance": 1}, return_document=ReturnDocument.AFTER,
+        )
+        if acc is not None and balances is not None:
+            balances[account_id] = acc["balance"]
+
+async def apply_balance_deltas(changes: List[tuple], session=None) -> dict:
+    """Fold (transaction, +1 added / -1 removed) pairs into one $inc per account.
+
+    Returns the new balance of every account that changed.
+    """
+    deltas = {}
+    for txn, sign in changes:
+        deltas[txn["account_id"]] = deltas.get(txn["account_id"], 0) + sign * signed_amount(txn["type"], txn["amount"])
+    ops = [UpdateOne(scoped({"_id": ObjectId(a)}), {"$inc": {"balance": d}}) for a, d in deltas.items() if d]
+    if not ops:
+        return {}
+    await accounts_col.bulk_write(ops, ordered=False, session=session)
+    changed = [ObjectId(a) for a, d in deltas.items() if d]
+    return {
+        str(acc["_id"]): acc["balance"]
+        async for acc in accounts_col.find(scoped({"_id": {"$in": changed}}), {"balance": 1}, session=session)
+    }
+
+async def compute_balances(account_ids: Optional[List[str]] = None, tenant_id: Optional[str] = None) -> dict:
+    """Recompute balances from scratch: initial balance plus signed transaction totals.
+
+    Without arguments this covers every tenant, for maintenance commands.
+    """
+    match = {"account_id": {"$in": account_ids}} if account_ids is not None else {}
+    if tenant_id is not None:
+        match["tenant_id"] = tenant_id
+    totals = {
+        row["_id"]: row["total"]
+        async for row in transactions_col.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$account_id", "total": signed_sum("$amount")}},
+        ])
+    }
+    acc_query = {"_id": {"$in": [ObjectId(a) for a in account_ids]}} if account_ids is not None else {}
+    return {
+        str(acc["_id"]): acc.get("initial_balance", 0) + totals.get(str(acc["_id"]), 0)
+        async for acc in accounts_col.find({**acc_query, **ACTIVE}, {"initial_balance": 1})
+    }
+
+async def reconcile_balances(fix: bool = True) -> List[dict]:
+    """Compare stored balances with recomputed ones and return any drift."""
+    await require_tenanted()
+    expected = await compute_balances()
+    drift = []
+    async for acc in accounts_col.find(ACTIVE, {"balance": 1, "account_name": 1}):
+        acc_id = str(acc["_id"])
+        stored = acc.get("balance")
+        if stored != expected[acc_id]:
+            drift.append({
+                "account_id": acc_id,
+                "account_name": acc.get("account_name"),
+                "stored": stored,
+                "expected": expected[acc_id],
+            })
+            if fix:
+                await accounts_col.update_one({"_id": acc["_id"]}, {"$set": {"balance": expected[acc_id]}})
+    return drift
+
+async def backfill_balances() -> int:
+    """Seed `balance` on accounts created before the ledger existed; returns how many.
+
+    Runs at startup before any write is served, since `$inc` on a missing
+    balance would start it from zero.
+    """
+    ids = [str(acc["_id"]) async for acc in accounts_col.find({"balance": {"$exists": False}, **ACTIVE}, {"_id": 1})]
+    if not ids:
+        return 0
+    balances = await compute_balances(ids)
+    await accounts_col.bulk_write([
+        UpdateOne({"_id": ObjectId(acc_id), "balance": {"$exists": False}}, {"$set": {"balance": balance}})
+        for acc_id, balance in balances.items()
+    ], ordered=False)
+    return len(balances)
+
+async def account_balance(acc: dict) -> int:
+    # Normally seeded by backfill_balances at startup
+    if "balance" not in acc:
+        acc["balance"] = (await compute_balances([str(acc["_id"])], acc.get("tenant_id")))[str(acc["_id"])]
+        await accounts_col.update_one({"_id": acc["_id"], "balance": {"$exists": False}}, {"$set": {"balance": acc["balance"]}})
+    return acc["balance"]
+
+# Change feed
+# Write handlers publish what they changed so open pages can patch their
+# lists in place instead of refetching them; see events.py. A "resync" op
+# tells clients to reload an entity after bulk changes.
+async def publish_change(entity: str, op: str, doc_id: Optional[str] = None,
+                         doc: Optional[dict] = None, balances: Optional[dict] = None):
+    event = {"entity": entity, "op": op}
+    if doc_id is not None:
+        event["id"] = doc_id
+    if doc is not None:
+        doc = serialize_doc(dict(doc))
+        event["doc"] = doc if entity == "account" else (await attach_account_info([doc]))[0]
+    if balances:
+        event["balances"] = balances
+    feed_for(tenant()).publish(event)
+
+# Monthly rollups
+# One document per (Jalali month, account, type, category) holding the
+# running total and count; transaction writes adjust them with `$inc` so
+# dashboards read a handful of rollups instead of raw history.
+def rollup_key(txn: dict) -> dict:
+    return {
+        "tenant_id": txn["tenant_id"],
+        "month": month_key(txn["date"]),
+        "account_id": txn["account_id"],
+        "type": txn["type"],
+        "category": txn["category"],
+    }
+
+async def apply_rollup_delta(key: dict, amount: int, count: int):
+    await rollups_col.update_one(key, {"$inc": {"total": amount, "count": count}}, upsert=True)
+    if count < 0:
+        await rollups_col.delete_one({**key, "count": {"$lte": 0}})
+
+async def apply_rollup_deltas(changes: List[tuple], session=None):
+    """Fold (transaction, +1 added / -1 removed) pairs into one upserted $inc per rollup."""
+    rollups = {}
+    for txn, sign in changes:
+        key = rollup_key(txn)
+        entry = rollups.setdefault(tuple(key.values()), [key, 0, 0])
+        entry[1] += sign * txn["amount"]
+        entry[2] += sign
+    ops = [
+        UpdateOne(key, {"$inc": {"total": total, "count": count}}, upsert=True)
+        for key, total, count in rollups.values()
+        if total or count
+    ]
+    if ops:
+        await rollups_col.bulk_write(ops, ordered=False, session=session)
+    if any(count < 0 for _, _, count in rollups.values()):
+        await rollups_col.delete_many(scoped({"count": {"$lte": 0}}), session=session)
+
+async def update_rollups(old: Optional[dict], new: Optional[dict]):
+    """Move a transaction's contribution from its old rollup to its new one."""
+    old_key = rollup_key(old) if old else None
+    new_key = rollup_key(new) if new else None
+    if old_key == new_key:
+        if new["amount"] != old["amount"]:
+            await apply_rollup_delta(new_key, new["amount"] - old["amount"], 0)
+        return
+    if old_key:
+        await apply_rollup_delta(old_key, -old["amount"], -1)
+    if new_key:
+        await apply_rollup_delta(new_key, new["amount"], 1)
+
+async def rebuild_rollups() -> int:
+    """Recompute every rollup from raw transactions; returns the rollup count."""
+    await require_tenanted()
+    rollups = {}
+    # Collapse to daily groups in Mongo, then fold days into Jalali months here
+    async for row in transactions_col.aggregate([
+        {"$group": {
+            "_id": {
+                "tenant_id": "$tenant_id", "date": "$date", "account_id": "$account_id",
+                "type": "$type", "category": "$category",
+            },
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+    ]):
+        key = rollup_key(row["_id"])
+        ident = tuple(key.values())
+        entry = rollups.setdefault(ident, {**key, "total": 0, "count": 0})
+        entry["total"] += row["total"]
+        entry["count"] += row["count"]
+    await rollups_col.delete_many({})
+    if rollups:
+        await rollups_col.insert_many(list(rollups.values()))
+    return len(rollups)
+
 # Pydantic Models
 class AccountCreate(BaseModel):
     bank_name: str
@@ -69,6 +767,8 @@ class TransactionCreate(BaseModel):
     description: Optional[str] = None
     date_jalali: str
 
+    check_date = field_validator("date_jalali")(validate_jalali)
+
 class TransactionUpdate(BaseModel):
     account_id: Optional[str] = None
     type: Optional[Literal["income", "expense"]] = None
@@ -77,6 +777,8 @@ class TransactionUpdate(BaseModel):
     description: Optional[str] = None
     date_jalali: Optional[str] = None
 
+    check_date = field_validator("date_jalali")(validate_jalali)
+
 class CheckCreate(BaseModel):
     account_id: str
     amount: int
@@ -85,6 +787,8 @@ class CheckCreate(BaseModel):
     status: Literal["pending", "passed", "bounced"] = "pending"
     description: Optional[str] = None
 
+    check_date = field_validator("due_date_jalali")(validate_jalali)
+
 class CheckUpdate(BaseModel):
     account_id: Optional[str] = None
     amount: Optional[int] = None
@@ -93,6 +797,39 @@ class CheckUpdate(BaseModel):
     status: Optional[Literal["pending", "passed", "bounced"]] = None
     description: Optional[str] = None
 
+    check_date = field_validator("due_date_jalali")(validate_jalali)
+
+class RecurringRuleCreate(BaseModel):
+    account_id: str
+    type: Literal["income", "expense"]
+    amount: int
+    category: str
+    description: Optional[str] = None
+    frequency: Literal[recurrence.FREQUENCIES] = "monthly"
+    interval: int = Field(1, ge=1, le=365)
+    # Monthly/yearly rules only; defaults to the start date's day
+    day_of_month: Optional[int] = Field(None, ge=1, le=31)
+    start_date_jalali: str
+    end_date_jalali: Optional[str] = None
+    active: bool = True
+
+    check_date = field_validator("start_date_jalali", "end_date_jalali")(validate_jalali)
+
+class RecurringRuleUpdate(BaseModel):
+    account_id: Optional[str] = None
+    type: Optional[Literal["income", "expense"]] = None
+    amount: Optional[int] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    frequency: Optional[Literal[recurrence.FREQUENCIES]] = None
+    interval: Optional[int] = Field(None, ge=1, le=365)
+    day_of_month: Optional[int] = Field(None, ge=1, le=31)
+    start_date_jalali: Optional[str] = None
+    end_date_jalali: Optional[str] = None
+    active: Optional[bool] = None
+
+    check_date = field_validator("start_date_jalali", "end_date_jalali")(validate_jalali)
+
 # Categories
 DEFAULT_CATEGORIES = [
     "خوراک", "حمل‌ونقل", "اجاره", "قبوض", "پوشاک", "سلامت",
@@ -100,294 +837,1529 @@ DEFAULT_CATEGORIES = [
 ]
 
 @app.get("/api/health")
-def health_check():
+async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
 # Account Endpoints
 @app.get("/api/accounts")
-def get_accounts():
-    accounts = list(accounts_col.find())
+async def get_accounts():
+    accounts = await accounts_col.find(scoped(ACTIVE)).to_list(None)
     result = []
     for acc in accounts:
-        acc_data = serialize_doc(acc)
-        # Calculate balance from transactions
-        balance = acc.get("initial_balance", 0)
-        txns = list(transactions_col.find({"account_id": acc_data["id"]}))
-        for txn in txns:
-            if txn["type"] == "income":
-                balance += txn["amount"]
-            else:
-                balance -= txn["amount"]
-        acc_data["balance"] = balance
-        result.append(acc_data)
-    return result
+        await account_balance(acc)
+        result.append(serialize_doc(acc))
+    return FastJSONResponse(result)
 
 @app.post("/api/accounts")
-def create_account(account: AccountCreate):
-    doc = account.model_dump()
+async def create_account(account: AccountCreate):
+    doc = scoped(account.model_dump())
     doc["created_at"] = datetime.now(timezone.utc)
     doc["created_at_jalali"] = to_jalali(doc["created_at"])
-    result = accounts_col.insert_one(doc)
-    doc["id"] = str(result.inserted_id)
     doc["balance"] = doc["initial_balance"]
-    del doc["_id"]
-    return doc
+    result = await accounts_col.insert_one(doc)
+    await publish_change("account", "insert", str(result.inserted_id), doc)
+    return serialize_doc(doc)
 
 @app.get("/api/accounts/{account_id}")
-def get_account(account_id: str):
-    acc = accounts_col.find_one({"_id": ObjectId(account_id)})
+async def get_account(account_id: str):
+    acc = await accounts_col.find_one(scoped({"_id": ObjectId(account_id), **ACTIVE}))
     if not acc:
         raise HTTPException(status_code=404, detail="حساب یافت نشد")
     return serialize_doc(acc)
 
 @app.put("/api/accounts/{account_id}")
-def update_account(account_id: str, account: AccountUpdate):
+async def update_account(account_id: str, account: AccountUpdate):
     update_data = {k: v for k, v in account.model_dump().items() if v is not None}
     if not update_data:
         raise HTTPException(status_code=400, detail="داده‌ای برای بروزرسانی ارسال نشده")
-    result = accounts_col.update_one({"_id": ObjectId(account_id)}, {"$set": update_data})
-    if result.matched_count == 0:
+    acc = await accounts_col.find_one_and_update(
+        scoped({"_id": ObjectId(account_id), **ACTIVE}), {"$set": update_data}, return_document=ReturnDocument.AFTER
+    )
+    invalidate_account_meta(account_id)
+    if acc is None:
         raise HTTPException(status_code=404, detail="حساب یافت نشد")
+    await publish_change("account", "update", account_id, acc)
     return {"message": "حساب با موفقیت بروزرسانی شد"}
 
 @app.delete("/api/accounts/{account_id}")
-def delete_account(account_id: str):
-    # Delete related transactions and checks
-    transactions_col.delete_many({"account_id": account_id})
-    checks_col.delete_many({"account_id": account_id})
-    result = accounts_col.delete_one({"_id": ObjectId(account_id)})
-    if result.deleted_count == 0:
+async def delete_account(account_id: str):
+    # Mark deleted now; related transactions and checks are purged in the background
+    result = await accounts_col.update_one(
+        scoped({"_id": ObjectId(account_id), **ACTIVE}),
+        {"$set": {"deleted_at": datetime.now(timezone.utc), "purge": {"transactions_deleted": 0, "checks_deleted": 0}}},
+    )
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="حساب یافت نشد")
-    return {"message": "حساب با موفقیت حذف شد"}
+    # Dashboards read rollups, so drop them up front to keep totals consistent
+    await rollups_col.delete_many(scoped({"account_id": account_id}))
+    spawn(purge_account(account_id, tenant()))
+    await publish_change("account", "delete", account_id)
+    return {"message": "حساب با موفقیت حذف شد", "purge_status": f"/api/accounts/{account_id}/purge"}
+
+@app.get("/api/accounts/{account_id}/purge")
+async def get_purge_status(account_id: str):
+    acc = await accounts_col.find_one(scoped({"_id": ObjectId(account_id)}), {"deleted_at": 1, "purge": 1})
+    if acc is None:
+        return {"status": "done"}
+    if "deleted_at" not in acc:
+        raise HTTPException(status_code=404, detail="حذفی برای این حساب در جریان نیست")
+    return {"status": "purging", **acc.get("purge", {})}
 
 # Transaction Endpoints
-@app.get("/api/transactions")
-def get_transactions(
+def transaction_filters(
     account_id: Optional[str] = None,
     type: Optional[str] = None,
     category: Optional[str] = None,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
-):
-    query = {}
+    end_date: Optional[str] = None,
+    min_amount: Optional[int] = Query(None, ge=0),
+    max_amount: Optional[int] = Query(None, ge=0)
+) -> dict:
+    query = scoped()
     if account_id:
         query["account_id"] = account_id
     if type:
         query["type"] = type
     if category:
         query["category"] = category
-    
-    transactions = list(transactions_col.find(query).sort("date", -1))
-    result = []
-    for txn in transactions:
-        txn_data = serialize_doc(txn)
-        # Get account info
-        acc = accounts_col.find_one({"_id": ObjectId(txn_data["account_id"])})
-        if acc:
-            txn_data["account_name"] = acc.get("account_name", "نامشخص")
-            txn_data["bank_name"] = acc.get("bank_name", "نامشخص")
-        result.append(txn_data)
-    return result
+    if start_date or end_date:
+        query["date"] = {}
+        if start_date:
+            query["date"]["$gte"] = parse_jalali_param(start_date, "start_date")
+        if end_date:
+            # end_date is inclusive: keep everything before the following day
+            query["date"]["$lt"] = parse_jalali_param(end_date, "end_date") + timedelta(days=1)
+    if min_amount is not None or max_amount is not None:
+        query["amount"] = {}
+        if min_amount is not None:
+            query["amount"]["$gte"] = min_amount
+        if max_amount is not None:
+            query["amount"]["$lte"] = max_amount
+    return query
+
+TRANSACTION_FIELDS = ("account_id", "type", "amount", "category", "description", "date_jalali", "date", "created_at")
+# Columns the transactions table and edit form use; `date` also feeds the cursor
+TRANSACTION_LEAN_FIELDS = ("type", "amount", "category", "description", "date_jalali")
+
+@app.get("/api/transactions")
+async def get_transactions(
+    query: dict = Depends(transaction_filters),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=200)
+):
+    fields_projection = projection(fields, TRANSACTION_FIELDS, TRANSACTION_LEAN_FIELDS, ("account_id", "date"))
+    terms = text_search.query_terms(q) if q else []
+    after = decode_cursor(cursor) if cursor else None
+    if after and terms and after[2] is None:
+        raise HTTPException(status_code=400, detail="نشانگر صفحه نامعتبر است")
+
+    # Fetch one extra row to know whether another page exists
+    query = await exclude_purging(query)
+    if query is None:
+        return FastJSONResponse({"items": [], "next_cursor": None})
+    if terms:
+        docs = await search_transactions(query, terms, fields_projection, limit + 1, after)
+    else:
+        if after:
+            # Keyset pagination on (date, _id), both descending
+            last_date, last_id, _ = after
+            query = {"$and": [query, {"$or": [
+                {"date": {"$lt": last_date}},
+                {"date": last_date, "_id": {"$lt": last_id}},
+            ]}]}
+        docs = await transactions_col.find(query, fields_projection).sort([("date", -1), ("_id", -1)]).limit(limit + 1).to_list(None)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["date"], docs[-1]["_id"], docs[-1].get("score"))
+    for doc in docs:
+        doc.pop("score", None)
+    transactions = [serialize_doc(txn) for txn in docs]
+    return FastJSONResponse({"items": await attach_account_info(transactions), "next_cursor": next_cursor})
+
+# Search
+# `q=` matches stored search_terms (see text_search.py). Rows rank by how
+# many query words match a whole term rather than just a prefix, then by
+# date; the cursor carries the score so pages stay stable.
+def search_score(terms: List[str]) -> dict:
+    return {"$add": [{"$cond": [{"$in": [t, "$search_terms"]}, 2, 1]} for t in terms]}
+
+async def search_transactions(query: dict, terms: List[str], fields_projection: dict, limit: int, after=None):
+    pipeline = [
+        {"$match": {"$and": [query, text_search.match_all(terms)]}},
+        {"$addFields": {"score": search_score(terms)}},
+    ]
+    if after:
+        last_date, last_id, last_score = after
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": last_score}},
+            {"score": last_score, "date": {"$lt": last_date}},
+            {"score": last_score, "date": last_date, "_id": {"$lt": last_id}},
+        ]}})
+    pipeline += [
+        {"$sort": {"score": -1, "date": -1, "_id": -1}},
+        {"$limit": limit},
+        {"$project": {**fields_projection, "score": 1}},
+    ]
+    return await transactions_col.aggregate(pipeline).to_list(None)
+
+def with_search_terms(doc: dict) -> dict:
+    doc["search_terms"] = text_search.index_terms(doc.get("description"), doc.get("category"))
+    return doc
+
+async def rebuild_search_terms(batch_size: int = 1000) -> int:
+    """Recompute stored search terms, e.g. for rows written before search existed."""
+    updated = 0
+    ops = []
+    async for txn in transactions_col.find({}, {"description": 1, "category": 1, "search_terms": 1}):
+        terms = text_search.index_terms(txn.get("description"), txn.get("category"))
+        if txn.get("search_terms") != terms:
+            ops.append(UpdateOne({"_id": txn["_id"]}, {"$set": {"search_terms": terms}}))
+        if len(ops) >= batch_size:
+            updated += (await transactions_col.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await transactions_col.bulk_write(ops, ordered=False)).modified_count
+    return updated
 
 @app.post("/api/transactions")
-def create_transaction(transaction: TransactionCreate):
+async def create_transaction(transaction: TransactionCreate):
     # Verify account exists
-    acc = accounts_col.find_one({"_id": ObjectId(transaction.account_id)})
+    acc = await accounts_col.find_one(scoped({"_id": ObjectId(transaction.account_id), **ACTIVE}))
     if not acc:
         raise HTTPException(status_code=404, detail="حساب یافت نشد")
     
-    doc = transaction.model_dump()
+    doc = with_search_terms(scoped(transaction.model_dump()))
     doc["date"] = from_jalali(transaction.date_jalali)
-    doc["created_at"] = datetime.now(timezone.utc)
-    result = transactions_col.insert_one(doc)
-    doc["id"] = str(result.inserted_id)
-    del doc["_id"]
+    doc["created_at"] = doc["updated_at"] = datetime.now(timezone.utc)
+    result = await transactions_col.insert_one(doc)
+    balances = {}
+    await apply_balance_delta(transaction.account_id, signed_amount(transaction.type, transaction.amount), balances)
+    await update_rollups(None, doc)
+    await publish_change("transaction", "insert", str(result.inserted_id), doc, balances)
+    serialize_doc(doc)
     doc["date"] = doc["date"].isoformat()
     doc["created_at"] = doc["created_at"].isoformat()
     return doc
 
+# Bulk import
+# Rows are streamed from the request body and written in chunks, so memory
+# stays bounded by IMPORT_CHUNK_SIZE and IMPORT_MAX_LINE_LENGTH no matter
+# how large the upload is.
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+# Longer lines are reported as failed rows instead of being buffered whole
+IMPORT_MAX_LINE_LENGTH = 64 * 1024
+
+async def iter_body_lines(request: Request):
+    """Yield each line of the body, or None for one over IMPORT_MAX_LINE_LENGTH."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    parts = []
+    size = 0
+    overlong = False
+
+    def take(piece: str) -> bool:
+        # Add to the current line; drop it once it grows past the limit
+        nonlocal parts, size, overlong
+        size += len(piece)
+        if size > IMPORT_MAX_LINE_LENGTH:
+            parts, overlong = [], True
+        elif not overlong:
+            parts.append(piece)
+        return not overlong
+
+    async def pieces():
+        async for chunk in request.stream():
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    async for text in pieces():
+        *complete, rest = text.split("\n")
+        for piece in complete:
+            yield "".join(parts).rstrip("\r") if take(piece) else None
+            parts, size, overlong = [], 0, False
+        take(rest)
+    if overlong:
+        yield None
+    elif parts:
+        yield "".join(parts).rstrip("\r")
+
+async def iter_import_rows(request: Request, fmt: str):
+    """Yield (row_number, record, error) for each non-empty line of the body."""
+    header = None
+    row_number = 0
+    async for line in iter_body_lines(request):
+        if line is None:
+            if fmt == "csv" and header is None:
+                raise HTTPException(status_code=413, detail="سطر عنوان فایل بیش از حد طولانی است")
+            row_number += 1
+            yield row_number, None, "سطر بیش از حد طولانی است"
+            continue
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [h.strip() for h in next(csv.reader([line]))]
+            continue
+        row_number += 1
+        try:
+            if fmt == "csv":
+                values = next(csv.reader([line]))
+                record = {k: (v if v != "" else None) for k, v in zip(header, values)}
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("هر سطر باید یک شیء JSON باشد")
+        except (csv.Error, ValueError) as e:
+            yield row_number, None, str(e)
+            continue
+        yield row_number, record, None
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self):
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+async def import_chunk(chunk: List[tuple], known_accounts: dict, report: ImportReport):
+    """Validate and insert one chunk of (row_number, TransactionCreate) pairs."""
+    # Resolve accounts not seen in earlier chunks with a single query
+    unseen = {t.account_id for _, t in chunk if t.account_id not in known_accounts}
+    if unseen:
+        valid = [ObjectId(a) for a in unseen if ObjectId.is_valid(a)]
+        found = {str(acc["_id"]) async for acc in accounts_col.find(scoped({"_id": {"$in": valid}, **ACTIVE}), {"_id": 1})}
+        for a in unseen:
+            known_accounts[a] = a in found
+
+    # Dates were validated with the rows; convert each distinct one once
+    dates = from_jalali_many(t.date_jalali for _, t in chunk)
+
+    rows = []
+    docs = []
+    now = datetime.now(timezone.utc)
+    for row_number, txn in chunk:
+        if not known_accounts[txn.account_id]:
+            report.error(row_number, "حساب یافت نشد")
+        else:
+            doc = with_search_terms(scoped(txn.model_dump()))
+            doc["date"] = dates[txn.date_jalali]
+            doc["created_at"] = doc["updated_at"] = now
+            rows.append(row_number)
+            docs.append(doc)
+    if not docs:
+        return
+
+    failed = set()
+    try:
+        await transactions_col.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            report.error(rows[err["index"]], err.get("errmsg", "خطای درج"))
+    written = [doc for i, doc in enumerate(docs) if i not in failed]
+    report.inserted += len(written)
+    changes = [(doc, 1) for doc in written]
+    await apply_balance_deltas(changes)
+    await apply_rollup_deltas(changes)
+
+@app.post("/api/transactions/import")
+async def import_transactions(request: Request, format: Optional[Literal["csv", "ndjson"]] = None):
+    """Bulk-insert transactions from a streamed CSV (with header) or NDJSON body."""
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+
+    report = ImportReport()
+    known_accounts = {}
+    chunk = []
+    async for row_number, record, error in iter_import_rows(request, format):
+        if error:
+            report.error(row_number, error)
+            continue
+        try:
+            chunk.append((row_number, TransactionCreate(**record)))
+        except ValidationError as e:
+            report.error(row_number, validation_message(e))
+            continue
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await import_chunk(chunk, known_accounts, report)
+            chunk = []
+    if chunk:
+        await import_chunk(chunk, known_accounts, report)
+    if report.inserted:
+        await publish_change("transaction", "resync")
+    return report.as_dict()
+
 @app.put("/api/transactions/{transaction_id}")
-def update_transaction(transaction_id: str, transaction: TransactionUpdate):
+async def update_transaction(transaction_id: str, transaction: TransactionUpdate):
     update_data = {k: v for k, v in transaction.model_dump().items() if v is not None}
     if "date_jalali" in update_data:
         update_data["date"] = from_jalali(update_data["date_jalali"])
     if not update_data:
         raise HTTPException(status_code=400, detail="داده‌ای برای بروزرسانی ارسال نشده")
-    result = transactions_col.update_one({"_id": ObjectId(transaction_id)}, {"$set": update_data})
-    if result.matched_count == 0:
+    if "account_id" in update_data:
+        # Moving to another account needs it to exist, like create_transaction
+        acc_id = update_data["account_id"]
+        if not ObjectId.is_valid(acc_id) or not await accounts_col.find_one(scoped({"_id": ObjectId(acc_id), **ACTIVE}), {"_id": 1}):
+            raise HTTPException(status_code=404, detail="حساب یافت نشد")
+    update_data["updated_at"] = datetime.now(timezone.utc)
+    old = await transactions_col.find_one_and_update(scoped({"_id": ObjectId(transaction_id)}), {"$set": update_data})
+    if old is None:
         raise HTTPException(status_code=404, detail="تراکنش یافت نشد")
+    new = {**old, **update_data}
+    if "description" in update_data or "category" in update_data:
+        with_search_terms(new)
+        if new["search_terms"] != old.get("search_terms"):
+            await transactions_col.update_one(scoped({"_id": old["_id"]}), {"$set": {"search_terms": new["search_terms"]}})
+    old_amount = signed_amount(old["type"], old["amount"])
+    new_amount = signed_amount(new["type"], new["amount"])
+    balances = {}
+    if old["account_id"] == new["account_id"]:
+        await apply_balance_delta(new["account_id"], new_amount - old_amount, balances)
+    else:
+        await apply_balance_delta(old["account_id"], -old_amount, balances)
+        await apply_balance_delta(new["account_id"], new_amount, balances)
+    await update_rollups(old, new)
+    await publish_change("transaction", "update", transaction_id, new, balances)
     return {"message": "تراکنش با موفقیت بروزرسانی شد"}
 
 @app.delete("/api/transactions/{transaction_id}")
-def delete_transaction(transaction_id: str):
-    result = transactions_col.delete_one({"_id": ObjectId(transaction_id)})
-    if result.deleted_count == 0:
+async def delete_transaction(transaction_id: str):
+    old = await transactions_col.find_one_and_delete(scoped({"_id": ObjectId(transaction_id)}))
+    if old is None:
         raise HTTPException(status_code=404, detail="تراکنش یافت نشد")
+    await record_deletions("transactions", [old["_id"]])
+    balances = {}
+    await apply_balance_delta(old["account_id"], -signed_amount(old["type"], old["amount"]), balances)
+    await update_rollups(old, None)
+    await publish_change("transaction", "delete", transaction_id, balances=balances)
     return {"message": "تراکنش با موفقیت حذف شد"}
 
 # Check Endpoints
-@app.get("/api/checks")
-def get_checks(
+def check_filters(
     account_id: Optional[str] = None,
     type: Optional[str] = None,
-    status: Optional[str] = None
-):
-    query = {}
+    status: Optional[str] = None,
+    overdue: Optional[bool] = None
+) -> dict:
+    query = scoped()
     if account_id:
         query["account_id"] = account_id
     if type:
         query["type"] = type
     if status:
         query["status"] = status
-    
-    checks = list(checks_col.find(query).sort("due_date", 1))
-    result = []
-    for check in checks:
-        check_data = serialize_doc(check)
-        # Get account info
-        acc = accounts_col.find_one({"_id": ObjectId(check_data["account_id"])})
-        if acc:
-            check_data["account_name"] = acc.get("account_name", "نامشخص")
-            check_data["bank_name"] = acc.get("bank_name", "نامشخص")
-        result.append(check_data)
-    return result
+    if overdue is not None:
+        query["overdue"] = True if overdue else {"$ne": True}
+    return query
+
+CHECK_FIELDS = (
+    "account_id", "amount", "due_date_jalali", "due_date", "type", "status", "description", "overdue", "created_at"
+)
+CHECK_LEAN_FIELDS = ("amount", "due_date_jalali", "type", "status", "description", "overdue")
+
+@app.get("/api/checks")
+async def get_checks(query: dict = Depends(check_filters), fields: Optional[str] = None):
+    fields_projection = projection(fields, CHECK_FIELDS, CHECK_LEAN_FIELDS, ("account_id",))
+    query = await exclude_purging(query)
+    if query is None:
+        return FastJSONResponse([])
+    checks = [serialize_doc(check) async for check in checks_col.find(query, fields_projection).sort("due_date", 1)]
+    return FastJSONResponse(await attach_account_info(checks))
 
 @app.post("/api/checks")
-def create_check(check: CheckCreate):
+async def create_check(check: CheckCreate):
     # Verify account exists
-    acc = accounts_col.find_one({"_id": ObjectId(check.account_id)})
+    acc = await accounts_col.find_one(scoped({"_id": ObjectId(check.account_id), **ACTIVE}))
     if not acc:
         raise HTTPException(status_code=404, detail="حساب یافت نشد")
     
-    doc = check.model_dump()
+    doc = scoped(check.model_dump())
     doc["due_date"] = from_jalali(check.due_date_jalali)
-    doc["created_at"] = datetime.now(timezone.utc)
-    result = checks_col.insert_one(doc)
-    doc["id"] = str(result.inserted_id)
-    del doc["_id"]
+    doc["created_at"] = doc["updated_at"] = datetime.now(timezone.utc)
+    doc["overdue"] = doc["status"] == "pending" and doc["due_date"] < today_start()
+    result = await checks_col.insert_one(doc)
+    await publish_change("check", "insert", str(result.inserted_id), doc)
+    serialize_doc(doc)
     doc["due_date"] = doc["due_date"].isoformat()
     doc["created_at"] = doc["created_at"].isoformat()
     return doc
 
 @app.put("/api/checks/{check_id}")
-def update_check(check_id: str, check: CheckUpdate):
+async def update_check(check_id: str, check: CheckUpdate):
     update_data = {k: v for k, v in check.model_dump().items() if v is not None}
     if "due_date_jalali" in update_data:
         update_data["due_date"] = from_jalali(update_data["due_date_jalali"])
     if not update_data:
         raise HTTPException(status_code=400, detail="داده‌ای برای بروزرسانی ارسال نشده")
-    result = checks_col.update_one({"_id": ObjectId(check_id)}, {"$set": update_data})
+    update_data["updated_at"] = datetime.now(timezone.utc)
+    result = await checks_col.update_one(scoped({"_id": ObjectId(check_id)}), {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="چک یافت نشد")
+    if "status" in update_data or "due_date" in update_data:
+        await flag_overdue_checks(scoped({"_id": ObjectId(check_id)}))
+    await publish_change("check", "update", check_id, await checks_col.find_one(scoped({"_id": ObjectId(check_id)})))
     return {"message": "چک با موفقیت بروزرسانی شد"}
 
 @app.delete("/api/checks/{check_id}")
-def delete_check(check_id: str):
-    result = checks_col.delete_one({"_id": ObjectId(check_id)})
+async def delete_check(check_id: str):
+    result = await checks_col.delete_one(scoped({"_id": ObjectId(check_id)}))
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="چک یافت نشد")
+    await record_deletions("checks", [ObjectId(check_id)])
+    await publish_change("check", "delete", check_id)
     return {"message": "چک با موفقیت حذف شد"}
 
+# Batch writes
+# Several transaction/check writes in one request. Every operation is
+# validated before anything is written, then each collection gets one
+# ordered bulk_write and balances and rollups one folded update each. On a
+# replica set or mongos all of it runs in a single multi-document
+# transaction; a standalone server applies the same writes without that
+# guarantee. An Idempotency-Key header makes retries replay the first
+# response instead of writing again; a standalone batch that may have been
+# partly applied is marked failed under its key and never run again.
+IDEMPOTENCY_LOCK_SECONDS = 60
+BATCH_PARTIAL_MESSAGE = "این درخواست نیمه‌کاره اجرا شده است؛ داده‌ها را بررسی کنید و با کلید جدید ارسال کنید"
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    entity: Literal["transaction", "check"]
+    id: Optional[str] = None
+    data: Optional[dict] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=BATCH_MAX_OPERATIONS)
+
+BATCH_MODELS = {
+    ("create", "transaction"): TransactionCreate,
+    ("update", "transaction"): TransactionUpdate,
+    ("create", "check"): CheckCreate,
+    ("update", "check"): CheckUpdate,
+}
+
+async def transactions_available() -> bool:
+    global transactions_supported
+    if transactions_supported is None:
+        try:
+            hello = await client.admin.command("hello")
+            transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            transactions_supported = False
+    return transactions_supported
+
+@asynccontextmanager
+async def write_session():
+    """A session inside a transaction, or None where transactions aren't supported."""
+    if not await transactions_available():
+        yield None
+        return
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            yield session
+
+def batch_error(index: int, message: str) -> HTTPException:
+    return HTTPException(status_code=422, detail=f"عملیات {index + 1}: {message}")
+
+def parse_batch_operation(index: int, operation: BatchOperation):
+    if operation.op != "create" and not (operation.id and ObjectId.is_valid(operation.id)):
+        raise batch_error(index, "شناسه نامعتبر است")
+    if operation.op == "delete":
+        return None
+    if not operation.data:
+        raise batch_error(index, "داده‌ای ارسال نشده")
+    try:
+        return BATCH_MODELS[(operation.op, operation.entity)](**operation.data)
+    except ValidationError as e:
+        raise batch_error(index, validation_message(e))
+
+async def execute_batch(operations: List[BatchOperation], session=None):
+    """Apply a batch; returns the response body and the change events to publish."""
+    parsed = [parse_batch_operation(i, op) for i, op in enumerate(operations)]
+    cols = {"transaction": transactions_col, "check": checks_col}
+
+    # Load every targeted document and referenced account up front
+    current = {}
+    for entity, col in cols.items():
+        ids = [ObjectId(op.id) for op in operations if op.entity == entity and op.op != "create"]
+        if ids:
+            async for doc in col.find(scoped({"_id": {"$in": ids}}), session=session):
+                current[(entity, str(doc["_id"]))] = doc
+    account_ids = [ObjectId(m.account_id) for m in parsed if m is not None and m.account_id and ObjectId.is_valid(m.account_id)]
+    known_accounts = {
+        str(acc["_id"])
+        async for acc in accounts_col.find(scoped({"_id": {"$in": account_ids}, **ACTIVE}), {"_id": 1}, session=session)
+    }
+
+    writes = {"transaction": [], "check": []}
+    deleted = {"transaction": [], "check": []}
+    changes = []
+    results = []
+    published = []
+    now = datetime.now(timezone.utc)
+    today = today_start()
+    for index, (operation, model) in enumerate(zip(operations, parsed)):
+        entity = operation.entity
+        if model is not None and model.account_id and model.account_id not in known_accounts:
+            raise batch_error(index, "حساب یافت نشد")
+        if operation.op == "create":
+            new = scoped(model.model_dump())
+            new["_id"] = ObjectId()
+            new["created_at"] = new["updated_at"] = now
+            if entity == "transaction":
+                new["date"] = from_jalali(new["date_jalali"])
+                changes.append((with_search_terms(new), 1))
+            else:
+                new["due_date"] = from_jalali(new["due_date_jalali"])
+                new["overdue"] = new["status"] == "pending" and new["due_date"] < today
+            writes[entity].append(InsertOne(new))
+        else:
+            old = current.get((entity, operation.id))
+            if old is None:
+                raise batch_error(index, "تراکنش یافت نشد" if entity == "transaction" else "چک یافت نشد")
+            if operation.op == "delete":
+                new = None
+                writes[entity].append(DeleteOne(scoped({"_id": old["_id"]})))
+                deleted[entity].append(old["_id"])
+            else:
+                update_data = {k: v for k, v in model.model_dump().items() if v is not None}
+                if not update_data:
+                    raise batch_error(index, "داده‌ای برای بروزرسانی ارسال نشده")
+                update_data["updated_at"] = now
+                if entity == "transaction":
+                    if "date_jalali" in update_data:
+                        update_data["date"] = from_jalali(update_data["date_jalali"])
+                    new = with_search_terms({**old, **update_data})
+                    update_data["search_terms"] = new["search_terms"]
+                else:
+                    if "due_date_jalali" in update_data:
+                        update_data["due_date"] = from_jalali(update_data["due_date_jalali"])
+                    new = {**old, **update_data}
+                    update_data["overdue"] = new["overdue"] = new["status"] == "pending" and new["due_date"] < today
+                writes[entity].append(UpdateOne(scoped({"_id": old["_id"]}), {"$set": update_data}))
+            if entity == "transaction":
+                changes.append((old, -1))
+                if new is not None:
+                    changes.append((new, 1))
+            # Later operations on the same id see this one's result
+            current[(entity, operation.id)] = new
+        doc_id = operation.id or str(new["_id"])
+        results.append({"op": operation.op, "entity": entity, "id": doc_id})
+        published.append((entity, operation.op, doc_id, new))
+
+    for entity, ops in writes.items():
+        if ops:
+            await cols[entity].bulk_write(ops, ordered=True, session=session)
+        await record_deletions(cols[entity].name, deleted[entity], session)
+    balances = await apply_balance_deltas(changes, session)
+    await apply_rollup_deltas(changes, session)
+    return {"results": results, "balances": balances}, published
+
+async def commit_batch(operations: List[BatchOperation], idempotency_id: Optional[str] = None) -> dict:
+    async with write_session() as session:
+        body, published = await execute_batch(operations, session)
+        if idempotency_id:
+            await idempotency_col.update_one(
+                {"_id": idempotency_id}, {"$set": {"state": "done", "response": body}}, session=session
+            )
+    for i, (entity, op, doc_id, doc) in enumerate(published):
+        last = i == len(published) - 1
+        await publish_change(entity, op, doc_id, doc, body["balances"] if last else None)
+    return body
+
+async def claim_idempotency_key(record_id: str, fingerprint: str) -> Optional[dict]:
+    """Reserve a key for this request; returns the stored record if it was already used."""
+    now = datetime.now(timezone.utc)
+    try:
+        await idempotency_col.insert_one({
+            "_id": record_id, "tenant_id": tenant(), "fingerprint": fingerprint, "state": "pending", "created_at": now,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+    record = await idempotency_col.find_one({"_id": record_id})
+    if record is None or record["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=422, detail="این کلید تکرارناپذیری برای درخواست دیگری استفاده شده است")
+    if record["state"] == "done":
+        return record
+    if record["state"] == "failed":
+        raise HTTPException(status_code=409, detail=BATCH_PARTIAL_MESSAGE)
+    # A pending key whose request died mid-way is taken over after a while;
+    # its transaction rolled back, but a standalone write may have landed
+    stale = {"_id": record_id, "state": "pending", "created_at": {"$lt": now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)}}
+    if not await transactions_available():
+        result = await idempotency_col.update_one(stale, {"$set": {"state": "failed"}})
+        if result.modified_count:
+            raise HTTPException(status_code=409, detail=BATCH_PARTIAL_MESSAGE)
+    elif await idempotency_col.find_one_and_update(stale, {"$set": {"created_at": now}}) is not None:
+        return None
+    raise HTTPException(status_code=409, detail="درخواستی با این کلید در حال اجراست")
+
+@app.post("/api/batch")
+async def run_batch(batch: BatchRequest, request: Request):
+    """Apply create/update/delete operations on transactions and checks together."""
+    key = request.headers.get("idempotency-key")
+    if key is None:
+        return FastJSONResponse(await commit_batch(batch.operations))
+    if not 0 < len(key) <= 255:
+        raise HTTPException(status_code=400, detail="کلید تکرارناپذیری نامعتبر است")
+    record_id = f"{tenant()}:{key}"
+    fingerprint = hashlib.sha256(dump_json(batch.model_dump())).hexdigest()
+    record = await claim_idempotency_key(record_id, fingerprint)
+    if record is not None:
+        return FastJSONResponse(record["response"], headers={"Idempotent-Replayed": "true"})
+    try:
+        body = await commit_batch(batch.operations, record_id)
+    except Exception as e:
+        # Validation fails before any write and a transaction rolls back, so
+        # the key is released for a retry; a standalone write may have landed
+        if isinstance(e, HTTPException) or transactions_supported:
+            await idempotency_col.delete_one({"_id": record_id, "state": "pending"})
+        else:
+            await idempotency_col.update_one({"_id": record_id, "state": "pending"}, {"$set": {"state": "failed"}})
+        raise
+    return FastJSONResponse(body)
+
+# Cheque maturity
+def today_start() -> datetime:
+    return datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time())
+
+async def flag_overdue_checks(scope: Optional[dict] = None, batch_size: int = CHECK_SCHEDULER_BATCH,
+                              tenants: Optional[set] = None) -> int:
+    """Set `overdue` on pending cheques past their due date and clear it on the rest.
+
+    Works in batches of ids so a large backlog never becomes one long write.
+    Returns the number of cheques whose flag changed; the tenants they
+    belong to are added to `tenants` if given.
+    """
+    today = today_start()
+    scope = scope or {}
+    changed = 0
+    for selector, flag in (
+        ({"status": "pending", "due_date": {"$lt": today}, "overdue": {"$ne": True}}, True),
+        ({"overdue": True, "$or": [{"status": {"$ne": "pending"}}, {"due_date": {"$gte": today}}]}, False),
+    ):
+        while True:
+            docs = await checks_col.find({**scope, **selector}, {"tenant_id": 1}).limit(batch_size).to_list(None)
+            if not docs:
+                break
+            ids = [doc["_id"] for doc in docs]
+            if tenants is not None:
+                tenants.update(doc.get("tenant_id") for doc in docs)
+            result = await checks_col.update_many(
+                {"_id": {"$in": ids}}, {"$set": {"overdue": flag, "updated_at": datetime.now(timezone.utc)}}
+            )
+            changed += result.modified_count
+            if len(ids) < batch_size:
+                break
+    return changed
+
+async def check_scheduler():
+    while True:
+        try:
+            tenants = set()
+            await flag_overdue_checks(tenants=tenants)
+            for tenant_id in tenants:
+                await response_cache.bump_generation(tenant_id)
+                feed_for(tenant_id).publish({"entity": "check", "op": "resync"})
+        except Exception:
+            logger.exception("overdue cheque scan failed")
+        await asyncio.sleep(CHECK_SCHEDULER_INTERVAL)
+
+@app.get("/api/checks/forecast")
+async def get_cash_flow_forecast(
+    days: int = Query(90, ge=1, le=730),
+    interval: Literal["day", "week"] = "day",
+    account_id: Optional[str] = None,
+    include_recurring: bool = True,
+):
+    """Stream projected balances as NDJSON, one line per period, from pending cheques and recurring rules."""
+    acc_query = scoped({"_id": ObjectId(account_id), **ACTIVE} if account_id else ACTIVE)
+    balances = {}
+    async for acc in accounts_col.find(acc_query, {"balance": 1, "initial_balance": 1, "tenant_id": 1}):
+        balances[str(acc["_id"])] = await account_balance(acc)
+    if account_id and not balances:
+        raise HTTPException(status_code=404, detail="حساب یافت نشد")
+
+    start = today_start()
+    step = timedelta(days=7 if interval == "week" else 1)
+    horizon = start + timedelta(days=days)
+    # No lower bound: pending cheques already past due land in the first period
+    check_query = scoped({"status": "pending", "due_date": {"$lt": horizon}})
+    if account_id:
+        check_query["account_id"] = account_id
+    cursor = checks_col.find(check_query, {"account_id": 1, "amount": 1, "type": 1, "due_date": 1}).sort("due_date", 1)
+
+    rule_query = scoped({"next_run": {"$lt": horizon}})
+    if account_id:
+        rule_query["account_id"] = account_id
+    rules = await rules_col.find(rule_query).to_list(None) if include_recurring else []
+    # (date, account, signed amount) in date order across all rules
+    occurrences = heapq.merge(*(
+        ((date, rule["account_id"], signed_amount(rule["type"], rule["amount"])) for date in rule_occurrences(rule, horizon))
+        for rule in rules
+    ))
+
+    async def next_check():
+        try:
+            return await cursor.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def periods():
+        check = await next_check()
+        occurrence = next(occurrences, None)
+        period_start = start
+        while period_start < horizon:
+            period_end = min(period_start + step, horizon)
+            flows = []
+            # Consume cheques and occurrences due before the end of this period
+            while check and check["due_date"] < period_end:
+                flows.append((check["account_id"], check["amount"] if check["type"] == "received" else -check["amount"]))
+                check = await next_check()
+            while occurrence and occurrence[0] < period_end:
+                flows.append(occurrence[1:])
+                occurrence = next(occurrences, None)
+            inflow = outflow = 0
+            for acc_id, amount in flows:
+                if acc_id in balances:
+                    balances[acc_id] += amount
+                    if amount > 0:
+                        inflow += amount
+                    else:
+                        outflow -= amount
+            yield dump_json({
+                "period_start_jalali": to_jalali(period_start),
+                "period_end_jalali": to_jalali(period_end - timedelta(days=1)),
+                "inflow": inflow,
+                "outflow": outflow,
+                "balances": balances,
+                "total_balance": sum(balances.values()),
+            }) + b"\n"
+            period_start = period_end
+
+    return StreamingResponse(periods(), media_type="application/x-ndjson")
+
+# Recurring transactions
+# A rule (e.g. rent on day 1 of every Jalali month) is turned into real
+# transactions by a background job. `materialized_through` is the date of
+# the last occurrence written and `next_run` the next one due, so each run
+# only generates what is new since then, and a rule's future is expanded
+# on demand (see recurrence.py) rather than stored.
+def rule_occurrences(rule: dict, until: Optional[datetime] = None):
+    """Lazy occurrence dates after the rule's watermark, up to `until` and its end date."""
+    end = rule.get("end_date")
+    if end is not None and (until is None or end < until):
+        until = end
+    return recurrence.occurrences(
+        rule["frequency"], rule["interval"], rule["start_date"], rule.get("day_of_month"),
+        after=rule.get("materialized_through"), until=until,
+    )
+
+def next_run(rule: dict) -> Optional[datetime]:
+    return next(rule_occurrences(rule), None) if rule.get("active", True) else None
+
+def serialize_rule(rule: dict) -> dict:
+    serialize_doc(rule)
+    rule["next_run_jalali"] = to_jalali(rule["next_run"]) if rule.get("next_run") else None
+    return rule
+
+def occurrence_id(rule: dict, date: datetime) -> ObjectId:
+    # _id is unique within the (tenant_id, _id) shard key, unlike a unique (recurring_id, date) index
+    return derived_id("recurring", rule["_id"], date.date().isoformat())
+
+async def insert_occurrences(rule: dict, dates: List[datetime], session=None) -> tuple:
+    """Insert a batch of occurrences with their deltas; returns (inserted, leading dates stored)."""
+    existing = {
+        doc["date"]
+        async for doc in transactions_col.find(
+            scoped({"recurring_id": str(rule["_id"]), "date": {"$gte": dates[0], "$lte": dates[-1]}}),
+            {"date": 1}, session=session,
+        )
+    }
+    now = datetime.now(timezone.utc)
+    docs = [
+        with_search_terms({
+            "_id": occurrence_id(rule, date),
+            "tenant_id": rule["tenant_id"],
+            "account_id": rule["account_id"],
+            "type": rule["type"],
+            "amount": rule["amount"],
+            "category": rule["category"],
+            "description": rule.get("description"),
+            "date_jalali": to_jalali(date),
+            "date": date,
+            "created_at": now,
+            "updated_at": now,
+            "recurring_id": str(rule["_id"]),
+        })
+        for date in dates
+        if date not in existing
+    ]
+    failed = {}
+    if docs:
+        try:
+            await transactions_col.insert_many(docs, ordered=False, session=session)
+        except BulkWriteError as e:
+            if session is not None:
+                raise
+            # Without a transaction, duplicates are a racing worker's writes
+            failed = {err["index"]: err.get("code") for err in e.details.get("writeErrors", [])}
+    lost = {docs[i]["date"] for i, code in failed.items() if code != 11000}
+    if lost:
+        logger.error("recurring rule %s: %d occurrence(s) not written", rule["_id"], len(lost))
+    stored = next((i for i, date in enumerate(dates) if date in lost), len(dates))
+    changes = [(doc, 1) for i, doc in enumerate(docs) if i not in failed]
+    await apply_balance_deltas(changes, session)
+    await apply_rollup_deltas(changes, session)
+    return len(changes), stored
+
+async def materialize_rule(rule: dict, today: datetime) -> int:
+    """Write the rule's occurrences due by `today` in batches; returns how many were inserted."""
+    acc = await accounts_col.find_one(scoped({"_id": ObjectId(rule["account_id"]), **ACTIVE}), {"_id": 1})
+    if not acc:
+        return 0
+    occurrences = rule_occurrences(rule)
+    pending = next(occurrences, None)
+    watermark = rule.get("materialized_through")
+    inserted = 0
+    while pending is not None and pending <= today:
+        dates = []
+        while pending is not None and pending <= today and len(dates) < RECURRING_BATCH_SIZE:
+            dates.append(pending)
+            pending = next(occurrences, None)
+        async with write_session() as session:
+            count, stored = await insert_occurrences(rule, dates, session)
+            matched = True
+            if stored:
+                # Conditional on the old watermark, so a racing worker stops instead of advancing it twice
+                result = await rules_col.update_one(
+                    {"_id": rule["_id"], "active": True, "materialized_through": watermark},
+                    {"$set": {
+                        "materialized_through": dates[stored - 1],
+                        "next_run": dates[stored] if stored < len(dates) else pending,
+                    }},
+                    session=session,
+                )
+                matched = bool(result.matched_count)
+                if not matched and session is not None:
+                    await session.abort_transaction()
+                    count = 0
+        inserted += count
+        if not matched or stored < len(dates):
+            break
+        watermark = dates[-1]
+    return inserted
+
+async def materialize_recurring(today: Optional[datetime] = None) -> int:
+    """Materialize every due rule across tenants; returns the transactions inserted."""
+    today = today or today_start()
+    tenants = set()
+    inserted = 0
+    async for rule in rules_col.find({"next_run": {"$lte": today}}):
+        # Runs outside a request, so bind each rule's tenant for scoped()
+        current_tenant.set(rule["tenant_id"])
+        try:
+            count = await materialize_rule(rule, today)
+        except Exception:
+            logger.exception("recurring rule %s failed; it will be retried on the next run", rule["_id"])
+            continue
+        if count:
+            inserted += count
+            tenants.add(rule["tenant_id"])
+    for tenant_id in tenants:
+        await response_cache.bump_generation(tenant_id)
+        feed_for(tenant_id).publish({"entity": "transaction", "op": "resync"})
+    return inserted
+
+async def recurring_scheduler():
+    while True:
+        try:
+            await materialize_recurring()
+        except Exception:
+            logger.exception("recurring transaction run failed")
+        await asyncio.sleep(RECURRING_SCHEDULER_INTERVAL)
+
+async def find_rule(rule_id: str) -> dict:
+    rule = await rules_col.find_one(scoped({"_id": ObjectId(rule_id)}))
+    if not rule:
+        raise HTTPException(status_code=404, detail="تراکنش دوره‌ای یافت نشد")
+    return rule
+
+async def schedule_rule(rule: dict) -> dict:
+    """Validate a new or edited rule and set its next run."""
+    if rule.get("end_date") and rule["end_date"] < rule["start_date"]:
+        raise HTTPException(status_code=400, detail="تاریخ پایان نباید پیش از تاریخ شروع باشد")
+    acc = await accounts_col.find_one(scoped({"_id": ObjectId(rule["account_id"]), **ACTIVE}), {"_id": 1})
+    if not acc:
+        raise HTTPException(status_code=404, detail="حساب یافت نشد")
+    rule["next_run"] = next_run(rule)
+    return rule
+
+async def catch_up_rule(rule: dict):
+    if rule["next_run"] is not None and await materialize_rule(rule, today_start()):
+        await publish_change("transaction", "resync")
+        rule.update(await rules_col.find_one({"_id": rule["_id"]}, {"materialized_through": 1, "next_run": 1}))
+
+@app.get("/api/recurring")
+async def get_recurring_rules(account_id: Optional[str] = None):
+    query = scoped({"account_id": account_id} if account_id else {})
+    return [serialize_rule(rule) async for rule in rules_col.find(query).sort("_id", 1)]
+
+@app.post("/api/recurring")
+async def create_recurring_rule(rule: RecurringRuleCreate):
+    doc = scoped(rule.model_dump())
+    doc["start_date"] = from_jalali(rule.start_date_jalali)
+    doc["end_date"] = from_jalali(rule.end_date_jalali) if rule.end_date_jalali else None
+    doc["materialized_through"] = None
+    doc["created_at"] = datetime.now(timezone.utc)
+    await schedule_rule(doc)
+    await rules_col.insert_one(doc)
+    # A rule starting in the past gets its missed occurrences right away
+    await catch_up_rule(doc)
+    return serialize_rule(doc)
+
+@app.put("/api/recurring/{rule_id}")
+async def update_recurring_rule(rule_id: str, rule: RecurringRuleUpdate):
+    """Update a rule; changes apply to occurrences not yet written."""
+    current = await find_rule(rule_id)
+    # Only the optional fields can be cleared with null
+    update_data = {
+        k: v for k, v in rule.model_dump(exclude_unset=True).items()
+        if v is not None or k in ("end_date_jalali", "day_of_month")
+    }
+    if not update_data:
+        raise HTTPException(status_code=400, detail="داده‌ای برای بروزرسانی ارسال نشده")
+    for field in ("start_date", "end_date"):
+        if f"{field}_jalali" in update_data:
+            value = update_data[f"{field}_jalali"]
+            update_data[field] = from_jalali(value) if value else None
+    if update_data.get("active") and not current.get("active", True):
+        # Resuming doesn't backfill the occurrences skipped while paused
+        resumed = today_start() - timedelta(days=1)
+        if current.get("materialized_through") is None or current["materialized_through"] < resumed:
+            update_data["materialized_through"] = resumed
+    updated = await schedule_rule({**current, **update_data})
+    update_data["next_run"] = updated["next_run"]
+    updated = await rules_col.find_one_and_update(
+        scoped({"_id": current["_id"]}), {"$set": update_data}, return_document=ReturnDocument.AFTER,
+    )
+    await catch_up_rule(updated)
+    return serialize_rule(updated)
+
+@app.delete("/api/recurring/{rule_id}")
+async def delete_recurring_rule(rule_id: str):
+    """Delete a rule; transactions it already created are kept."""
+    result = await rules_col.delete_one(scoped({"_id": ObjectId(rule_id)}))
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="تراکنش دوره‌ای یافت نشد")
+    return {"message": "تراکنش دوره‌ای با موفقیت حذف شد"}
+
+# Exports
+EXPORT_BATCH_SIZE = 1000
+
+TRANSACTION_EXPORT_COLUMNS = [
+    ("date_jalali", "تاریخ"),
+    ("type", "نوع"),
+    ("amount", "مبلغ"),
+    ("category", "دسته‌بندی"),
+    ("description", "توضیحات"),
+    ("account_name", "حساب"),
+    ("bank_name", "بانک"),
+    ("account_id", "شناسه حساب"),
+    ("id", "شناسه"),
+]
+
+CHECK_EXPORT_COLUMNS = [
+    ("due_date_jalali", "تاریخ سررسید"),
+    ("type", "نوع"),
+    ("status", "وضعیت"),
+    ("amount", "مبلغ"),
+    ("description", "توضیحات"),
+    ("account_name", "حساب"),
+    ("bank_name", "بانک"),
+    ("overdue", "سررسید گذشته"),
+    ("account_id", "شناسه حساب"),
+    ("id", "شناسه"),
+]
+
+async def export_rows(cursor, date_field: str):
+    """Yield serialized rows batch by batch, resolving account names per batch."""
+    batch = []
+    async for doc in cursor:
+        doc = serialize_doc(doc)
+        doc[date_field + "_jalali"] = to_jalali(doc[date_field])
+        batch.append(doc)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            for row in await attach_account_info(batch):
+                yield row
+            batch = []
+    for row in await attach_account_info(batch):
+        yield row
+
+def export_response(rows, columns, fmt: str, name: str) -> StreamingResponse:
+    if fmt == "xlsx" and not exporters.xlsx_available():
+        raise HTTPException(status_code=400, detail="خروجی XLSX روی این سرور در دسترس نیست")
+    return StreamingResponse(
+        exporters.WRITERS[fmt](rows, columns),
+        media_type=exporters.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+async def empty_rows():
+    return
+    yield
+
+@app.get("/api/transactions/export")
+async def export_transactions(
+    query: dict = Depends(transaction_filters),
+    format: Literal["csv", "ndjson", "xlsx"] = "csv"
+):
+    query = await exclude_purging(query)
+    if query is None:
+        rows = empty_rows()
+    else:
+        cursor = transactions_col.find(query, batch_size=EXPORT_BATCH_SIZE).sort([("date", -1), ("_id", -1)])
+        rows = export_rows(cursor, "date")
+    return export_response(rows, TRANSACTION_EXPORT_COLUMNS, format, "transactions")
+
+@app.get("/api/checks/export")
+async def export_checks(
+    query: dict = Depends(check_filters),
+    format: Literal["csv", "ndjson", "xlsx"] = "csv"
+):
+    query = await exclude_purging(query)
+    if query is None:
+        rows = empty_rows()
+    else:
+        cursor = checks_col.find(query, batch_size=EXPORT_BATCH_SIZE).sort("due_date", 1)
+        rows = export_rows(cursor, "due_date")
+    return export_response(rows, CHECK_EXPORT_COLUMNS, format, "checks")
+
+# Change Feed Endpoint
+@app.get("/api/events")
+async def get_events(request: Request):
+    """Server-sent events for every write; resumes from the Last-Event-ID header."""
+    feed = feed_for(tenant())
+    last_event_id = request.headers.get("last-event-id")
+    sub = feed.subscribe(int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    return StreamingResponse(
+        events.stream(feed, sub, dump_json, EVENTS_HEARTBEAT),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Metrics Endpoint
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Categories Endpoint
 @app.get("/api/categories")
-def get_categories():
+async def get_categories():
     return DEFAULT_CATEGORIES
 
 # Dashboard/Stats Endpoints
 @app.get("/api/dashboard/stats")
-def get_dashboard_stats():
+async def get_dashboard_stats(request: Request):
+    return await cached_response(request, dashboard_stats)
+
+async def dashboard_stats():
     # Get current Jalali month
     now = datetime.now(timezone.utc)
     jnow = jdatetime.datetime.fromgregorian(datetime=now)
-    current_month_start = jdatetime.datetime(jnow.year, jnow.month, 1)
-    current_month_start_gregorian = current_month_start.togregorian()
     
     # Total balance
-    accounts = list(accounts_col.find())
+    accounts = await accounts_col.find(scoped(ACTIVE), {"balance": 1, "initial_balance": 1, "tenant_id": 1}).to_list(None)
     total_balance = 0
     for acc in accounts:
-        balance = acc.get("initial_balance", 0)
-        txns = list(transactions_col.find({"account_id": str(acc["_id"])}))
-        for txn in txns:
-            if txn["type"] == "income":
-                balance += txn["amount"]
-            else:
-                balance -= txn["amount"]
-        total_balance += balance
+        total_balance += await account_balance(acc)
     
     # Monthly income/expense
     monthly_income = 0
     monthly_expense = 0
-    all_txns = list(transactions_col.find({"date": {"$gte": current_month_start_gregorian}}))
-    for txn in all_txns:
-        if txn["type"] == "income":
-            monthly_income += txn["amount"]
+    async for rollup in rollups_col.find(scoped({"month": jnow.strftime("%Y/%m")}), {"type": 1, "total": 1}):
+        if rollup["type"] == "income":
+            monthly_income += rollup["total"]
         else:
-            monthly_expense += txn["amount"]
+            monthly_expense += rollup["total"]
     
     # Pending checks count
-    pending_checks = checks_col.count_documents({"status": "pending"})
+    pending_checks = await checks_col.count_documents(await exclude_purging(scoped({"status": "pending"})))
+    overdue_checks = await checks_col.count_documents(await exclude_purging(scoped({"overdue": True})))
     
     return {
         "total_balance": total_balance,
         "monthly_income": monthly_income,
         "monthly_expense": monthly_expense,
         "pending_checks": pending_checks,
+        "overdue_checks": overdue_checks,
         "accounts_count": len(accounts),
         "current_month_jalali": jnow.strftime("%B %Y")
     }
 
 @app.get("/api/dashboard/chart-data")
-def get_chart_data():
+async def get_chart_data(request: Request, months: int = Query(6, ge=1, le=120)):
+    return await cached_response(request, lambda: chart_data(months))
+
+async def chart_data(months: int):
     now = datetime.now(timezone.utc)
     jnow = jdatetime.datetime.fromgregorian(datetime=now)
-    
-    # Last 6 months data
+    labels, keys, _ = month_window(jnow.year, jnow.month, months)
+
+    # One round trip over the rollups: monthly trend, expense categories and all-time totals
+    def sum_of(kind):
+        return {"$sum": {"$cond": [{"$eq": ["$type", kind]}, "$total", 0]}}
+
+    facets = (await rollups_col.aggregate([{"$match": scoped()}, {"$facet": {
+        "monthly": [
+            {"$match": {"month": {"$in": list(keys)}}},
+            {"$group": {"_id": "$month", "income": sum_of("income"), "expense": sum_of("expense")}},
+        ],
+        "categories": [
+            {"$match": {"type": "expense"}},
+            {"$group": {"_id": {"$ifNull": ["$category", "سایر"]}, "value": {"$sum": "$total"}}},
+            {"$sort": {"value": -1}},
+            {"$limit": 8},
+        ],
+        "totals": [
+            {"$group": {"_id": "$type", "total": {"$sum": "$total"}}},
+        ],
+    }}]).to_list(1))[0]
+
+    buckets = {row["_id"]: row for row in facets["monthly"]}
     months_data = []
-    for i in range(5, -1, -1):
-        month = jnow.month - i
-        year = jnow.year
-        if month <= 0:
-            month += 12
-            year -= 1
-        
-        month_start = jdatetime.datetime(year, month, 1)
-        if month == 12:
-            month_end = jdatetime.datetime(year + 1, 1, 1)
-        else:
-            month_end = jdatetime.datetime(year, month + 1, 1)
-        
-        start_gregorian = month_start.togregorian()
-        end_gregorian = month_end.togregorian()
-        
-        txns = list(transactions_col.find({
-            "date": {"$gte": start_gregorian, "$lt": end_gregorian}
-        }))
-        
-        income = sum(t["amount"] for t in txns if t["type"] == "income")
-        expense = sum(t["amount"] for t in txns if t["type"] == "expense")
-        
+    for label, key in zip(labels, keys):
+        bucket = buckets.get(key, {})
         months_data.append({
-            "month": month_start.strftime("%B"),
-            "income": income,
-            "expense": expense
+            "month": label,
+            "income": bucket.get("income", 0),
+            "expense": bucket.get("expense", 0)
         })
-    
-    # Category distribution
-    all_expense_txns = list(transactions_col.find({"type": "expense"}))
-    category_totals = {}
-    for txn in all_expense_txns:
-        cat = txn.get("category", "سایر")
-        category_totals[cat] = category_totals.get(cat, 0) + txn["amount"]
-    
-    categories = [{"name": k, "value": v} for k, v in category_totals.items()]
-    categories.sort(key=lambda x: x["value"], reverse=True)
-    
+
+    categories = [{"name": row["_id"], "value": row["value"]} for row in facets["categories"]]
+
+    totals = {"income": 0, "expense": 0}
+    for row in facets["totals"]:
+        totals[row["_id"]] = row["total"]
+
     return {
         "monthly_trend": months_data,
-        "category_distribution": categories[:8]
+        "category_distribution": categories,
+        "totals": totals
+    }
+
+# Balance history
+# Past balances are rebuilt from checkpoints rather than full history: the
+# monthly rollups give every account's closing balance for any month, so a
+# series only scans raw transactions from the start of its first month
+# (daily) or last month (monthly), in one date-sorted pass.
+BALANCE_HISTORY_MAX_POINTS = 2000
+
+async def month_nets(account_ids: List[str], months: dict) -> List[tuple]:
+    """Signed rollup totals as (month, account, net) for months matching `months`."""
+    return [
+        (row["_id"]["month"], row["_id"]["account_id"], row["net"])
+        async for row in rollups_col.aggregate([
+            {"$match": scoped({"account_id": {"$in": account_ids}, "month": months})},
+            {"$group": {"_id": {"month": "$month", "account_id": "$account_id"}, "net": signed_sum("$total")}},
+        ])
+    ]
+
+async def daily_nets(account_ids: List[str], start: datetime, end: datetime):
+    """Signed transaction totals as (day, account, net) in [start, end), in date order."""
+    async for row in transactions_col.aggregate([
+        {"$match": scoped({"account_id": {"$in": account_ids}, "date": {"$gte": start, "$lt": end}})},
+        {"$group": {"_id": {"date": "$date", "account_id": "$account_id"}, "net": signed_sum("$amount")}},
+        {"$sort": {"_id.date": 1}},
+    ]):
+        yield row["_id"]["date"], row["_id"]["account_id"], row["net"]
+
+@app.get("/api/reports/balance-history")
+async def get_balance_history(
+    request: Request,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    interval: Literal["day", "month"] = "month",
+    account_id: Optional[str] = None,
+):
+    """Balances per account and in total at the close of each day or Jalali
+    month from start_date to end_date (inclusive).
+
+    Defaults to the last 30 days or the last 12 months up to today.
+    """
+    end = parse_jalali_param(end_date, "end_date") if end_date else today_start()
+    end_year, end_month, _ = parse(to_jalali(end))
+    if start_date:
+        start = parse_jalali_param(start_date, "start_date")
+    else:
+        start = end - timedelta(days=29) if interval == "day" else month_start(end_year, end_month - 11)
+    if start > end:
+        raise HTTPException(status_code=400, detail="تاریخ شروع نباید پس از تاریخ پایان باشد")
+    start_year, start_month, _ = parse(to_jalali(start))
+    months = (end_year * 12 + end_month) - (start_year * 12 + start_month) + 1
+    if ((end - start).days + 1 if interval == "day" else months) > BALANCE_HISTORY_MAX_POINTS:
+        raise HTTPException(status_code=400, detail="بازه زمانی برای این تفکیک بیش از حد طولانی است")
+    return await cached_response(
+        request, lambda: balance_history(start, end, interval, account_id, months)
+    )
+
+async def balance_history(start: datetime, end: datetime, interval: str, account_id: Optional[str], months: int):
+    acc_query = scoped({"_id": ObjectId(account_id), **ACTIVE} if account_id else ACTIVE)
+    balances = {
+        str(acc["_id"]): acc.get("initial_balance", 0)
+        async for acc in accounts_col.find(acc_query, {"initial_balance": 1})
+    }
+    if account_id and not balances:
+        raise HTTPException(status_code=404, detail="حساب یافت نشد")
+    account_ids = list(balances)
+    series = []
+
+    def close(label: str):
+        series.append({"date_jalali": label, "balances": dict(balances), "total_balance": sum(balances.values())})
+
+    # Checkpoint: closing balances of the month before the range
+    start_year, start_month, _ = parse(to_jalali(start))
+    end_year, end_month, _ = parse(to_jalali(end))
+    for _, acc_id, net in await month_nets(account_ids, {"$lt": month_key(start)}):
+        balances[acc_id] += net
+    day_after_end = end + timedelta(days=1)
+
+    if interval == "month":
+        _, keys, _ = month_window(end_year, end_month, months)
+        nets = {}
+        for month, acc_id, net in await month_nets(account_ids, {"$gte": keys[0], "$lt": keys[-1]}):
+            nets.setdefault(month, []).append((acc_id, net))
+        # The last month may end mid-way, so it is summed from transactions
+        async for _, acc_id, net in daily_nets(account_ids, month_start(end_year, end_month), day_after_end):
+            nets.setdefault(keys[-1], []).append((acc_id, net))
+        for key in keys:
+            for acc_id, net in nets.get(key, []):
+                balances[acc_id] += net
+            close(key)
+    else:
+        day = start
+        async for date, acc_id, net in daily_nets(account_ids, month_start(start_year, start_month), day_after_end):
+            # Days before `start` only move the opening balances
+            while day < date:
+                close(to_jalali(day))
+                day += timedelta(days=1)
+            balances[acc_id] += net
+        while day <= end:
+            close(to_jalali(day))
+            day += timedelta(days=1)
+
+    return {
+        "interval": interval,
+        "start_date_jalali": to_jalali(start),
+        "end_date_jalali": to_jalali(end),
+        "series": series,
+    }
+
+# Analytics snapshots
+# Long-horizon reports read columnar snapshots (see snapshots.py) instead of
+# scanning the live collections. Transaction and check writes stamp
+# `updated_at` and deletes leave a tombstone in `deletions`, so each run
+# exports only what changed since the tenant's watermark; anything newer
+# is read from MongoDB and merged in when a report is computed.
+def snapshots_enabled() -> bool:
+    return snapshot_store is not None and snapshots.available()
+
+async def record_deletions(collection: str, ids: list, session=None):
+    if not ids or not snapshots_enabled():
+        return
+    now = datetime.now(timezone.utc)
+    await deletions_col.insert_many(
+        [{"tenant_id": tenant(), "collection": collection, "doc_id": str(i), "deleted_at": now} for i in ids],
+        session=session,
+    )
+
+def snapshot_row(doc: dict, collection: Optional[str] = None) -> dict:
+    row = {k: v for k, v in doc.items() if k != "_id"}
+    row["id"] = str(doc["_id"])
+    if collection in snapshots.PARTITION_BY:
+        # Older rows may store Persian digits; partitions and periods come from the Gregorian date
+        jalali_field, date_field = snapshots.PARTITION_BY[collection]
+        row[jalali_field] = to_jalali(doc[date_field])
+    return row
+
+def snapshot_fields(collection: str) -> dict:
+    return {name: 1 for name, _ in snapshots.COLUMNS[collection] if name != "id"}
+
+async def snapshot_collection(tenant_id: str, name: str, since: Optional[datetime], cutoff: datetime) -> int:
+    """Merge one collection's changes in (since, cutoff] into the snapshot; returns its row count."""
+    col = db[name]
+    if since is None:
+        # Full export in date order, so each batch touches few partitions
+        query = {"tenant_id": tenant_id, "$or": [{"updated_at": {"$lte": cutoff}}, {"updated_at": {"$exists": False}}]}
+        cursor = col.find(query, snapshot_fields(name)).sort(snapshots.PARTITION_BY[name][1], 1)
+        deleted = []
+    else:
+        cursor = col.find({"tenant_id": tenant_id, "updated_at": {"$gt": since, "$lte": cutoff}}, snapshot_fields(name))
+        deleted = [
+            row["doc_id"] async for row in deletions_col.find(
+                {"tenant_id": tenant_id, "collection": name, "deleted_at": {"$gt": since, "$lte": cutoff}}, {"doc_id": 1},
+            )
+        ]
+    count = None
+    batch = []
+    async for doc in cursor:
+        batch.append(snapshot_row(doc, name))
+        if len(batch) >= SNAPSHOT_BATCH_SIZE:
+            count = await asyncio.to_thread(snapshot_store.merge, tenant_id, name, batch, deleted)
+            batch, deleted = [], []
+    if batch or deleted or count is None:
+        count = await asyncio.to_thread(snapshot_store.merge, tenant_id, name, batch, deleted)
+    return count
+
+async def snapshot_tenant(tenant_id: str, full: bool = False) -> dict:
+    """Bring one tenant's snapshot up to SNAPSHOT_SETTLE_SECONDS ago; returns row counts."""
+    manifest = None if full else await asyncio.to_thread(snapshot_store.manifest, tenant_id)
+    if manifest is None:
+        await asyncio.to_thread(snapshot_store.clear, tenant_id)
+    since = manifest["watermark"] if manifest else None
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+    # BSON dates have millisecond precision
+    cutoff = cutoff.replace(microsecond=cutoff.microsecond // 1000 * 1000)
+    counts = {}
+    for name in ("transactions", "checks"):
+        counts[name] = await snapshot_collection(tenant_id, name, since, cutoff)
+    accounts = [snapshot_row(acc) async for acc in accounts_col.find({"tenant_id": tenant_id}, snapshot_fields("accounts"))]
+    await asyncio.to_thread(snapshot_store.replace, tenant_id, "accounts", accounts)
+    counts["accounts"] = len(accounts)
+    # The manifest goes last: until it is written, readers use the old watermark
+    await asyncio.to_thread(snapshot_store.write_manifest, tenant_id, cutoff, counts)
+    await deletions_col.delete_many({"tenant_id": tenant_id, "deleted_at": {"$lte": cutoff}})
+    return counts
+
+async def run_snapshots(full: bool = False) -> dict:
+    """Snapshot every tenant; returns row counts per tenant."""
+    if not snapshots_enabled():
+        raise RuntimeError("set SNAPSHOT_DIR and install pyarrow and pandas to take snapshots")
+    results = {}
+    for tenant_id in await accounts_col.distinct("tenant_id"):
+        try:
+            results[tenant_id] = await snapshot_tenant(tenant_id, full)
+        except Exception:
+            logger.exception("snapshot of tenant %s failed; it will be retried on the next run", tenant_id)
+    return results
+
+async def snapshot_scheduler():
+    while True:
+        try:
+            await run_snapshots()
+        except Exception:
+            logger.exception("analytics snapshot run failed")
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+
+# Analytics report
+# Transaction totals per Jalali year or month and category, bank or
+# account, over any date range. With a snapshot the bulk is aggregated
+# from Parquet with pandas and only the tail since its watermark comes from
+# MongoDB; without one the whole range is grouped in MongoDB.
+ANALYTICS_COLUMNS = ["id", "account_id", "category", "amount", "date_jalali"]
+
+def snapshot_groups(tenant_id: str, txn_type: str, start, end, exclude: set) -> List[tuple]:
+    """(month, account, category, total, count) from the snapshot, minus `exclude`d ids."""
+    frame = snapshot_store.read(tenant_id, "transactions", ANALYTICS_COLUMNS, {"type": txn_type}, start, end)
+    frame = frame[~frame["id"].isin(exclude)]
+    frame = frame.assign(month=frame["date_jalali"].str.slice(0, 7))
+    grouped = frame.groupby(["month", "account_id", "category"], sort=False)["amount"].agg(["sum", "count"])
+    return list(grouped.reset_index().itertuples(index=False, name=None))
+
+async def analytics_groups(txn_type: str, start: Optional[datetime], end: Optional[datetime]):
+    """Grouped rows for the range and the snapshot watermark they include (None if live)."""
+    query = {"type": txn_type}
+    if start or end:
+        query["date"] = {}
+        if start:
+            query["date"]["$gte"] = start
+        if end:
+            query["date"]["$lt"] = end
+    manifest = await asyncio.to_thread(snapshot_store.manifest, tenant()) if snapshots_enabled() else None
+    if manifest is None:
+        # Daily groups from Mongo, folded into Jalali months by the caller
+        groups = [
+            (month_key(row["_id"]["date"]), row["_id"]["account_id"], row["_id"]["category"], row["total"], row["count"])
+            async for row in transactions_col.aggregate([
+                {"$match": scoped(query)},
+                {"$group": {
+                    "_id": {"date": "$date", "account_id": "$account_id", "category": "$category"},
+                    "total": {"$sum": "$amount"},
+                    "count": {"$sum": 1},
+                }},
+            ])
+        ]
+        return groups, None
+
+    watermark = manifest["watermark"]
+    # Rows changed or deleted since the snapshot replace their snapshot versions
+    tail = await transactions_col.find(
+        scoped({"updated_at": {"$gt": watermark}}), {"account_id": 1, "type": 1, "amount": 1, "category": 1, "date": 1},
+    ).to_list(None)
+    exclude = {str(doc["_id"]) for doc in tail}
+    async for row in deletions_col.find(scoped({"collection": "transactions", "deleted_at": {"$gt": watermark}}), {"doc_id": 1}):
+        exclude.add(row["doc_id"])
+    groups = await asyncio.to_thread(snapshot_groups, tenant(), txn_type, start, end, exclude)
+    for doc in tail:
+        if doc["type"] == txn_type and (not start or doc["date"] >= start) and (not end or doc["date"] < end):
+            groups.append((month_key(doc["date"]), doc["account_id"], doc["category"], doc["amount"], 1))
+    return groups, watermark
+
+@app.get("/api/reports/analytics")
+async def get_analytics(
+    request: Request,
+    group_by: Literal["category", "bank", "account"] = "category",
+    period: Literal["year", "month"] = "year",
+    type: Literal["income", "expense"] = "expense",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """Totals and counts per Jalali year or month and category, bank or account."""
+    start = parse_jalali_param(start_date, "start_date") if start_date else None
+    end = parse_jalali_param(end_date, "end_date") + timedelta(days=1) if end_date else None
+    return await cached_response(request, lambda: analytics(group_by, period, type, start, end))
+
+async def analytics(group_by: str, period: str, txn_type: str, start: Optional[datetime], end: Optional[datetime]):
+    groups, watermark = await analytics_groups(txn_type, start, end)
+    # Live accounts only: rows of deleted accounts drop out here
+    accounts = {
+        str(acc["_id"]): acc
+        async for acc in accounts_col.find(scoped(ACTIVE), {"account_name": 1, "bank_name": 1})
     }
+    totals = {}
+    for month, account_id, category, total, count in groups:
+        acc = accounts.get(account_id)
+        if acc is None:
+            continue
+        key = category if group_by == "category" else acc.get("bank_name" if group_by == "bank" else "account_name")
+        entry = totals.setdefault((month[:4] if period == "year" else month, key), [0, 0])
+        entry[0] += int(total)
+        entry[1] += int(count)
+    rows = [
+        {"period": p, "key": key, "total": total, "count": count}
+        for (p, key), (total, count) in sorted(totals.items(), key=lambda item: (item[0][0], -item[1][0]))
+    ]
+    return {"source": "snapshot" if watermark else "live", "snapshot_watermark": watermark, "rows": rows}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # Event streams never finish on their own, so bound the wait on shutdown
+    uvicorn.run(app, host="0.0.0.0", port=8001, timeout_graceful_shutdown=5)
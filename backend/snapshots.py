@@ -0,0 +1,203 @@
+"""Columnar snapshots of a tenant's data for long-horizon reports.
+
+Transactions and checks are written as Parquet files partitioned by Jalali
+year and month of their date (due date for checks):
+
+    <root>/tenant=<id>/transactions/year=1403/month=05/part.parquet
+
+Each partition holds exactly one row per document, its latest version, so
+readers can prune partitions freely. An incremental run merges changed
+rows and deletions into only the partitions they touch; `_index.parquet`
+maps every id to its partition so a row that moved month is removed from
+the old one. Accounts are small and rewritten whole on every run.
+
+`_manifest.json` records the watermark: documents changed after it are
+not in the files and must be read from MongoDB.
+
+Needs the optional pyarrow package (and pandas for reads). All functions
+here block, so callers run them in a worker thread.
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from jalali_calendar import to_jalali
+
+# Bumped when the file layout changes; older snapshots are rebuilt in full
+FORMAT_VERSION = 2
+INDEX_FILE = "_index.parquet"
+MANIFEST_FILE = "_manifest.json"
+PART_FILE = "part.parquet"
+
+# (column, arrow type name) per collection; `id` is the document's _id
+COLUMNS = {
+    "transactions": [
+        ("id", "string"), ("account_id", "string"), ("type", "string"), ("amount", "int64"),
+        ("category", "string"), ("description", "string"), ("date", "timestamp"), ("date_jalali", "string"),
+        ("recurring_id", "string"), ("created_at", "timestamp"), ("updated_at", "timestamp"),
+    ],
+    "checks": [
+        ("id", "string"), ("account_id", "string"), ("amount", "int64"), ("type", "string"),
+        ("status", "string"), ("description", "string"), ("due_date", "timestamp"),
+        ("due_date_jalali", "string"), ("overdue", "bool"), ("created_at", "timestamp"), ("updated_at", "timestamp"),
+    ],
+    "accounts": [
+        ("id", "string"), ("bank_name", "string"), ("account_name", "string"), ("account_number", "string"),
+        ("sheba", "string"), ("initial_balance", "int64"), ("color", "string"),
+        ("created_at", "timestamp"), ("deleted_at", "timestamp"),
+    ],
+}
+
+# (Jalali, Gregorian) date columns that pick each collection's partition
+PARTITION_BY = {"transactions": ("date_jalali", "date"), "checks": ("due_date_jalali", "due_date")}
+
+
+def available() -> bool:
+    try:
+        import pandas  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def schema(collection: str):
+    import pyarrow as pa
+
+    types = {"string": pa.string(), "int64": pa.int64(), "bool": pa.bool_(), "timestamp": pa.timestamp("ms")}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS[collection]])
+
+
+def partition_of(jalali_date: str) -> str:
+    return f"year={jalali_date[:4]}/month={jalali_date[5:7]}"
+
+
+def _write_atomic(table, path: str):
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class SnapshotStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def tenant_dir(self, tenant_id: str) -> str:
+        # The "tenant=" prefix keeps ids like ".." from escaping the root
+        return os.path.join(self.root, f"tenant={tenant_id}")
+
+    def manifest(self, tenant_id: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.tenant_dir(tenant_id), MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        if manifest.get("format") != FORMAT_VERSION:
+            return None
+        manifest["watermark"] = datetime.fromisoformat(manifest["watermark"])
+        return manifest
+
+    def write_manifest(self, tenant_id: str, watermark: datetime, counts: Dict[str, int]):
+        path = os.path.join(self.tenant_dir(tenant_id), MANIFEST_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"format": FORMAT_VERSION, "watermark": watermark.isoformat(), "counts": counts}, f)
+        os.replace(tmp, path)
+
+    def clear(self, tenant_id: str):
+        shutil.rmtree(self.tenant_dir(tenant_id), ignore_errors=True)
+
+    def replace(self, tenant_id: str, collection: str, rows: List[dict]):
+        """Rewrite an unpartitioned collection with `rows`."""
+        import pyarrow as pa
+
+        table = pa.Table.from_pylist(rows, schema=schema(collection))
+        _write_atomic(table, os.path.join(self.tenant_dir(tenant_id), collection, PART_FILE))
+
+    def merge(self, tenant_id: str, collection: str, rows: List[dict], deleted_ids: Iterable[str]) -> int:
+        """Upsert `rows` and drop `deleted_ids`, rewriting only the partitions they touch.
+
+        Returns the collection's row count afterwards.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        base = os.path.join(self.tenant_dir(tenant_id), collection)
+        index_path = os.path.join(base, INDEX_FILE)
+        index = {}
+        if os.path.exists(index_path):
+            table = pq.read_table(index_path)
+            index = dict(zip(table.column("id").to_pylist(), table.column("partition").to_pylist()))
+
+        date_column = PARTITION_BY[collection][0]
+        incoming: Dict[str, List[dict]] = {}
+        for row in rows:
+            incoming.setdefault(partition_of(row[date_column]), []).append(row)
+        removed = {row["id"] for row in rows} | set(deleted_ids)
+        touched = {index[i] for i in removed if i in index} | set(incoming)
+
+        for partition in touched:
+            path = os.path.join(base, partition, PART_FILE)
+            parts = []
+            if os.path.exists(path):
+                existing = pq.read_table(path, schema=schema(collection))
+                parts.append(existing.filter(pc.invert(pc.is_in(existing.column("id"), pa.array(list(removed))))))
+            if partition in incoming:
+                parts.append(pa.Table.from_pylist(incoming[partition], schema=schema(collection)))
+            table = pa.concat_tables(parts) if parts else None
+            if table is None or table.num_rows == 0:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            _write_atomic(table, path)
+
+        for i in removed:
+            index.pop(i, None)
+        for partition, partition_rows in incoming.items():
+            for row in partition_rows:
+                index[row["id"]] = partition
+        _write_atomic(
+            pa.table({"id": list(index), "partition": list(index.values())}, schema=pa.schema([
+                ("id", pa.string()), ("partition", pa.string()),
+            ])),
+            index_path,
+        )
+        return len(index)
+
+    def read(self, tenant_id: str, collection: str, columns: List[str], equals: Optional[dict] = None,
+             since: Optional[datetime] = None, until: Optional[datetime] = None):
+        """Snapshot rows as a pandas DataFrame.
+
+        `equals` filters columns by value and `since`/`until` bound the
+        partitioning date (until is exclusive); both are pushed down to the
+        scan, and the date bounds also prune whole Jalali years.
+        """
+        import pyarrow.dataset as ds
+
+        base = os.path.join(self.tenant_dir(tenant_id), collection)
+        dataset = ds.dataset(base, format="parquet", partitioning="hive") if os.path.isdir(base) else None
+        if dataset is None or not dataset.files:
+            return schema(collection).empty_table().select(columns).to_pandas()
+        date_column = PARTITION_BY[collection][1]
+        conditions = [ds.field(name) == value for name, value in (equals or {}).items()]
+        if since is not None:
+            conditions += [ds.field(date_column) >= since, ds.field("year") >= int(to_jalali(since)[:4])]
+        if until is not None:
+            conditions += [ds.field(date_column) < until, ds.field("year") <= int(to_jalali(until)[:4])]
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
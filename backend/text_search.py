@@ -0,0 +1,68 @@
+"""Persian-aware search terms for transaction descriptions and categories.
+
+Each transaction stores the normalized words of its description and
+category in `search_terms`, a multikey-indexed array. A query matches
+when every query word is a prefix of some stored term, which MongoDB
+answers with anchored-regex range scans on that index.
+
+Normalization folds the usual keyboard variants together: Arabic yeh and
+kaf become Persian ی and ک, hamza forms and diacritics are dropped, and
+digits become Latin. Words written with a zero-width non-joiner (ZWNJ,
+as in "حمل‌ونقل") are stored both joined and as their parts, so
+"حمل‌ونقل", "حملونقل" and "حمل ونقل" all find the same row.
+"""
+import re
+from typing import Iterable, List
+
+ZWNJ = "\u200c"
+
+_FOLD = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و",
+    **{d: str(i % 10) for i, d in enumerate("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩")},
+})
+# Harakat, superscript alef, tatweel, and joiners other than ZWNJ
+_STRIP = re.compile("[\u064b-\u0670\u0640\u200d\u200e\u200f\ufeff]")
+# ZWNJ is kept inside words so both joined and split forms can be emitted
+_WORD = re.compile(r"[\w\u200c]+")
+
+MAX_QUERY_TERMS = 8
+
+
+def normalize_text(text: str) -> str:
+    return _STRIP.sub("", text.translate(_FOLD)).lower()
+
+
+def _words(text: str) -> List[str]:
+    return [w.strip(ZWNJ) for w in _WORD.findall(normalize_text(text)) if w.strip(ZWNJ)]
+
+
+def index_terms(*fields: str) -> List[str]:
+    """Distinct terms to store for the given field values (None is skipped)."""
+    terms = set()
+    for text in fields:
+        if not text:
+            continue
+        for word in _words(text):
+            parts = [p for p in word.split(ZWNJ) if p]
+            terms.add("".join(parts))
+            terms.update(parts)
+    return sorted(terms)
+
+
+def query_terms(query: str) -> List[str]:
+    """Terms a search must match; ZWNJ-joined words are matched whole."""
+    terms = []
+    for word in _words(query):
+        term = word.replace(ZWNJ, "")
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def match_all(terms: Iterable[str]) -> dict:
+    """Mongo filter requiring every term as a prefix of a stored term."""
+    return {"$and": [{"search_terms": {"$regex": "^" + re.escape(t)}} for t in terms]}
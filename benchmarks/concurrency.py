@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Concurrent throughput benchmark for the Personal Finance API.
+
+Fires requests from N concurrent clients against a running server and
+reports throughput and latency percentiles per endpoint. Run it once
+against each server build to compare them, e.g.:
+
+    python benchmarks/concurrency.py --clients 50 --requests 2000
+    python benchmarks/concurrency.py --base-url http://localhost:8001 --clients 100
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+ENDPOINTS = [
+    "api/accounts",
+    "api/transactions",
+    "api/checks",
+    "api/dashboard/stats",
+    "api/dashboard/chart-data",
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_endpoint(client, endpoint, clients, total_requests, method="GET", make_request=None):
+    """Send `total_requests` requests from `clients` workers.
+
+    `make_request`, if given, returns extra keyword arguments (json=,
+    content=, headers=) for each request, so writes can vary their body.
+    """
+    latencies = []
+    errors = 0
+    remaining = total_requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, endpoint, **(make_request() if make_request else {}))
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "method": method,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        results = []
+        for endpoint in args.endpoints:
+            results.append(await run_endpoint(client, endpoint, args.clients, args.requests))
+
+    print(f"{'endpoint':28} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for r in results:
+        print(f"{r['endpoint']:28} {r['throughput']:9.1f} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} {r['errors']:7}")
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients (default: 50)")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint (default: 1000)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS)
+    return asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Synthetic dataset generator for the Personal Finance benchmarks.
+
+Produces accounts, transactions, cheques and recurring rules shaped
+exactly like the API writes them, spread over realistic Jalali dates and the app's default
+categories, then rebuilds the derived balances and monthly rollups.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import server
+from jalali_calendar import to_jalali
+from text_search import index_terms
+
+BANKS = ["بانک ملت", "بانک ملی", "بانک صادرات", "بانک تجارت", "بانک سپه", "بانک پاسارگاد", "بانک سامان"]
+ACCOUNT_NAMES = ["حساب اصلی", "پس‌انداز", "حساب جاری", "حساب کسب‌وکار", "حساب مشترک"]
+COLORS = ["#0F766E", "#B45309", "#1D4ED8", "#BE123C", "#6D28D9"]
+INCOME_CATEGORIES = ["حقوق", "فروش", "هدیه", "سایر"]
+EXPENSE_CATEGORIES = [c for c in server.DEFAULT_CATEGORIES if c not in ("حقوق", "فروش")]
+DESCRIPTIONS = ["خرید ماهانه", "پرداخت قبض", "اجاره خانه", "حقوق ماهانه", "تعمیر خودرو", "هدیه تولد", None]
+
+INSERT_CHUNK = 5000
+
+
+def _date_in_range(rng: random.Random, days: int) -> datetime:
+    today = datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time())
+    return today - timedelta(days=rng.randrange(days))
+
+
+def account_docs(rng, count, tenant_id):
+    now = datetime.now(timezone.utc)
+    for i in range(count):
+        initial = rng.randrange(0, 500_000_000, 10_000)
+        yield {
+            "tenant_id": tenant_id,
+            "bank_name": rng.choice(BANKS),
+            "account_name": f"{rng.choice(ACCOUNT_NAMES)} {i + 1}",
+            "account_number": str(rng.randrange(10**9, 10**10)),
+            "sheba": "IR" + "".join(str(rng.randrange(10)) for _ in range(24)),
+            "initial_balance": initial,
+            "color": rng.choice(COLORS),
+            "created_at": now,
+            "created_at_jalali": to_jalali(now),
+            "balance": initial,
+        }
+
+
+def transaction_docs(rng, account_ids, count, history_days, tenant_id):
+    now = datetime.now(timezone.utc)
+    for _ in range(count):
+        # Roughly one income for every four expenses, like a household ledger
+        kind = "income" if rng.random() < 0.2 else "expense"
+        date = _date_in_range(rng, history_days)
+        category = rng.choice(INCOME_CATEGORIES if kind == "income" else EXPENSE_CATEGORIES)
+        description = rng.choice(DESCRIPTIONS)
+        yield {
+            "tenant_id": tenant_id,
+            "account_id": rng.choice(account_ids),
+            "type": kind,
+            "amount": rng.randrange(10_000, 50_000_000 if kind == "income" else 5_000_000, 1_000),
+            "category": category,
+            "description": description,
+            "date_jalali": to_jalali(date),
+            "date": date,
+            "created_at": now,
+            "updated_at": now,
+            "search_terms": index_terms(description, category),
+        }
+
+
+def check_docs(rng, account_ids, count, history_days, tenant_id):
+    now = datetime.now(timezone.utc)
+    today = datetime.combine(now.date(), datetime.min.time())
+    for _ in range(count):
+        due = today + timedelta(days=rng.randrange(-history_days // 4, 365))
+        status = "pending" if due >= today or rng.random() < 0.2 else rng.choice(["passed", "passed", "bounced"])
+        yield {
+            "tenant_id": tenant_id,
+            "account_id": rng.choice(account_ids),
+            "amount": rng.randrange(1_000_000, 200_000_000, 100_000),
+            "due_date_jalali": to_jalali(due),
+            "due_date": due,
+            "type": rng.choice(["received", "paid"]),
+            "status": status,
+            "description": rng.choice(DESCRIPTIONS),
+            "created_at": now,
+            "updated_at": now,
+            "overdue": status == "pending" and due < today,
+        }
+
+
+def rule_docs(rng, account_ids, count, tenant_id):
+    now = datetime.now(timezone.utc)
+    today = datetime.combine(now.date(), datetime.min.time())
+    for _ in range(count):
+        kind = "income" if rng.random() < 0.3 else "expense"
+        # Starting after today, so generating data never materializes them
+        start = today + timedelta(days=rng.randrange(1, 31))
+        rule = {
+            "tenant_id": tenant_id,
+            "account_id": rng.choice(account_ids),
+            "type": kind,
+            "amount": rng.randrange(1_000_000, 50_000_000, 100_000),
+            "category": rng.choice(INCOME_CATEGORIES if kind == "income" else EXPENSE_CATEGORIES),
+            "description": rng.choice(DESCRIPTIONS),
+            "frequency": rng.choice(["monthly", "monthly", "weekly"]),
+            "interval": 1,
+            "day_of_month": None,
+            "start_date_jalali": to_jalali(start),
+            "end_date_jalali": None,
+            "active": True,
+            "start_date": start,
+            "end_date": None,
+            "materialized_through": None,
+            "created_at": now,
+        }
+        rule["next_run"] = server.next_run(rule)
+        yield rule
+
+
+async def _insert_chunked(col, docs):
+    chunk = []
+    for doc in docs:
+        chunk.append(doc)
+        if len(chunk) >= INSERT_CHUNK:
+            await col.insert_many(chunk, ordered=False)
+            chunk = []
+    if chunk:
+        await col.insert_many(chunk, ordered=False)
+
+
+async def generate(accounts: int, transactions: int, checks: int, history_days: int = 1095, seed: int = 1,
+                   tenants: int = 1, rules: int = 5):
+    """Replace the connected database's contents with a synthetic dataset.
+
+    Each of `tenants` households gets the given number of accounts,
+    transactions, checks and recurring rules; the first one is server.DEFAULT_TENANT, which
+    requests without a tenant header read.
+    """
+    rng = random.Random(seed)
+    for col in (
+        server.accounts_col, server.transactions_col, server.checks_col, server.rollups_col,
+        server.rules_col, server.deletions_col, server.idempotency_col,
+    ):
+        await col.delete_many({})
+
+    tenant_ids = [server.DEFAULT_TENANT] + [f"tenant-{i}" for i in range(1, tenants)]
+    for tenant_id in tenant_ids:
+        result = await server.accounts_col.insert_many(list(account_docs(rng, accounts, tenant_id)))
+        account_ids = [str(oid) for oid in result.inserted_ids]
+        await _insert_chunked(server.transactions_col,
+                              transaction_docs(rng, account_ids, transactions, history_days, tenant_id))
+        await _insert_chunked(server.checks_col, check_docs(rng, account_ids, checks, history_days, tenant_id))
+        await _insert_chunked(server.rules_col, rule_docs(rng, account_ids, rules, tenant_id))
+
+    await server.reconcile_balances(fix=True)
+    await server.rebuild_rollups()
+    server.account_meta_cache.clear()
+    for tenant_id in tenant_ids:
+        await server.response_cache.bump_generation(tenant_id)
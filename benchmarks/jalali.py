@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks: memoized Jalali conversions vs. per-call jdatetime.
+
+    python benchmarks/jalali.py [--rows 100000] [--days 1500]
+
+Converts `rows` values drawn from `days` distinct dates, which mirrors a
+transaction history where many rows share the same day.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import jdatetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+import jalali_calendar  # noqa: E402
+
+
+def naive_from_jalali(jalali_str):
+    parts = jalali_str.split("/")
+    return jdatetime.datetime(int(parts[0]), int(parts[1]), int(parts[2])).togregorian()
+
+
+def naive_to_jalali(dt):
+    return jdatetime.datetime.fromgregorian(datetime=dt).strftime("%Y/%m/%d")
+
+
+def naive_month_boundaries(year, month, months):
+    result = []
+    for i in range(months - 1, -1, -1):
+        m, y = month - i, year
+        while m <= 0:
+            m += 12
+            y -= 1
+        start = jdatetime.datetime(y, m, 1)
+        end = jdatetime.datetime(y + 1, 1, 1) if m == 12 else jdatetime.datetime(y, m + 1, 1)
+        result.append((start.togregorian(), end.togregorian()))
+    return result
+
+
+def bench(label, func, repeat=3):
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{label:44} {best * 1000:10.1f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=1500)
+    args = parser.parse_args()
+
+    start = datetime(2021, 3, 21)
+    days = [start + timedelta(days=i) for i in range(args.days)]
+    gregorian = [random.choice(days) for _ in range(args.rows)]
+    jalali = [naive_to_jalali(dt) for dt in gregorian]
+
+    print(f"{args.rows} rows over {args.days} distinct days")
+    base = bench("from_jalali  per-call jdatetime", lambda: [naive_from_jalali(s) for s in jalali])
+    fast = bench("from_jalali  memoized", lambda: [jalali_calendar.from_jalali(s) for s in jalali])
+    print(f"{'':44} {base / fast:9.1f}x")
+    fast = bench("from_jalali_many batch", lambda: jalali_calendar.from_jalali_many(jalali))
+    print(f"{'':44} {base / fast:9.1f}x")
+    base = bench("to_jalali    per-call jdatetime", lambda: [naive_to_jalali(dt) for dt in gregorian])
+    fast = bench("to_jalali    memoized", lambda: jalali_calendar.to_jalali_many(gregorian))
+    print(f"{'':44} {base / fast:9.1f}x")
+    base = bench("24-month boundaries per-call x1000", lambda: [naive_month_boundaries(1403, 7, 24) for _ in range(1000)])
+    fast = bench("24-month boundaries table x1000", lambda: [jalali_calendar.month_window(1403, 7, 24) for _ in range(1000)])
+    print(f"{'':44} {base / fast:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
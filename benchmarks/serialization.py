@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Compare the old and new encoding paths of the listing endpoints.
+
+"full" is what /api/transactions used to do: every stored field, passed
+through FastAPI's jsonable_encoder and the stdlib json module. "lean" is
+the current path: the default projection encoded by orjson. Rows are
+built in memory by the benchmark data generator, so no database is needed.
+
+    python benchmarks/serialization.py --rows 10000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+import server  # noqa: E402
+import datagen  # noqa: E402
+
+
+def build_rows(count, seed):
+    rng = random.Random(seed)
+    account_ids = [f"{i:024x}" for i in range(1, 11)]
+    docs = []
+    for doc in datagen.transaction_docs(rng, account_ids, count, 1095, server.DEFAULT_TENANT):
+        doc["_id"] = server.ObjectId()
+        docs.append(doc)
+    return docs
+
+
+def with_account(doc):
+    doc = server.serialize_doc(doc)
+    doc["account_name"] = "حساب اصلی"
+    doc["bank_name"] = "بانک ملت"
+    return doc
+
+
+def encode_full(docs):
+    items = [with_account(dict(doc)) for doc in docs]
+    # Same settings as starlette.responses.JSONResponse
+    body = jsonable_encoder({"items": items, "next_cursor": None})
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def encode_lean(docs):
+    keep = ("_id", "account_id", "date", *server.TRANSACTION_LEAN_FIELDS)
+    items = [with_account({k: doc[k] for k in keep}) for doc in docs]
+    return server.dump_json({"items": items, "next_cursor": None})
+
+
+def measure(func, docs, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func(docs)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    docs = build_rows(args.rows, args.seed)
+    full_ms, full_bytes = measure(encode_full, docs, args.repeat)
+    lean_ms, lean_bytes = measure(encode_lean, docs, args.repeat)
+    print(f"{args.rows} rows, median of {args.repeat}")
+    print(f"full  jsonable_encoder+json  {full_ms:8.1f} ms  {full_bytes / 1024:8.1f} KiB")
+    print(f"lean  projection+orjson      {lean_ms:8.1f} ms  {lean_bytes / 1024:8.1f} KiB")
+    print(f"saved {full_ms - lean_ms:.1f} ms ({1 - lean_ms / full_ms:.0%}), "
+          f"{(full_bytes - lean_bytes) / 1024:.1f} KiB ({1 - lean_bytes / full_bytes:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Reproducible performance suite for the Personal Finance API.
+
+For each dataset size it generates synthetic data, then drives every
+endpoint in-process at each concurrency level and records p50/p95/p99
+latency and throughput. Reads run first; writes go last and only add
+or edit throwaway rows. Results are written as JSON so runs
+from different commits can be diffed.
+
+    # against a scratch database on a local mongod (it is wiped!)
+    python benchmarks/suite.py --mongo-url mongodb://localhost:27017 --db finance_bench
+
+    # against an in-memory stand-in (needs mongomock-motor)
+    python benchmarks/suite.py --memory --sizes 3:1000:100 --concurrency 1,10
+
+Sizes are ACCOUNTS:TRANSACTIONS:CHECKS triples per tenant. With
+--tenants N the same volume is generated for N households and requests
+read the default one, which shows per-tenant cost staying flat as the
+total grows.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+import server  # noqa: E402
+from cache import MemoryCache  # noqa: E402
+from concurrency import run_endpoint  # noqa: E402
+import datagen  # noqa: E402
+from jalali_calendar import to_jalali  # noqa: E402
+
+DEFAULT_SIZES = "5:1000:100,10:10000:1000,20:100000:5000"
+DEFAULT_CONCURRENCY = "1,10,50"
+IMPORT_ROWS = 100
+BATCH_SIZE = 10
+
+
+async def endpoints(client):
+    """(label, method, path, make_request) to measure, with ids taken from the generated data."""
+    account = await server.accounts_col.find_one({"tenant_id": server.DEFAULT_TENANT}, {"_id": 1})
+    account_id = str(account["_id"])
+    today = to_jalali(datetime.now(timezone.utc))
+    amounts = itertools.count(1000, 1000)
+
+    def transaction():
+        return {
+            "account_id": account_id, "type": "expense", "amount": next(amounts),
+            "category": "سایر", "description": "benchmark", "date_jalali": today,
+        }
+
+    def batch():
+        return [{"op": "create", "entity": "transaction", "data": transaction()} for _ in range(BATCH_SIZE)]
+
+    # Throwaway rows for the update and replay benchmarks
+    response = await client.post("api/transactions", json=transaction())
+    response.raise_for_status()
+    transaction_id = response.json()["id"]
+    replay = {"json": {"operations": batch()}, "headers": {"Idempotency-Key": uuid.uuid4().hex}}
+    response = await client.post("api/batch", **replay)
+    response.raise_for_status()
+
+    reads = [
+        "api/accounts",
+        "api/transactions?limit=100",
+        f"api/transactions?limit=100&account_id={account_id}",
+        "api/transactions?limit=100&type=expense&start_date=1403/01/01&end_date=1403/12/29",
+        "api/transactions?limit=100&q=اجاره",
+        "api/checks?status=pending",
+        "api/dashboard/stats",
+        "api/dashboard/chart-data",
+        "api/dashboard/chart-data?months=24",
+        "api/reports/balance-history?start_date=1402/01/01&end_date=1403/12/29",
+        "api/reports/balance-history?interval=day&start_date=1403/01/01&end_date=1403/12/29",
+        "api/reports/analytics?group_by=bank&period=month",
+        "api/checks/forecast?days=90",
+        "api/recurring",
+        "api/transactions/export?format=csv",
+        "api/transactions/export?format=ndjson&start_date=1403/01/01&end_date=1403/12/29",
+        "api/checks/export?format=xlsx",
+    ]
+    writes = [
+        ("POST api/transactions", "POST", "api/transactions", lambda: {"json": transaction()}),
+        ("PUT api/transactions/{id}", "PUT", f"api/transactions/{transaction_id}",
+         lambda: {"json": {"amount": next(amounts)}}),
+        (f"POST api/transactions/import ({IMPORT_ROWS} rows)", "POST", "api/transactions/import?format=ndjson",
+         lambda: {"content": "\n".join(json.dumps(transaction()) for _ in range(IMPORT_ROWS)).encode()}),
+        (f"POST api/batch ({BATCH_SIZE} creates)", "POST", "api/batch",
+         lambda: {"json": {"operations": batch()}, "headers": {"Idempotency-Key": uuid.uuid4().hex}}),
+        # Same key and body every time: served from the stored response
+        ("POST api/batch (idempotent replay)", "POST", "api/batch", lambda: replay),
+    ]
+    return [(path, "GET", path, None) for path in reads] + writes
+
+
+def parse_sizes(spec):
+    sizes = []
+    for part in spec.split(","):
+        accounts, transactions, checks = (int(x) for x in part.split(":"))
+        sizes.append({"accounts": accounts, "transactions": transactions, "checks": checks})
+    return sizes
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def connect(args):
+    if args.memory:
+        import mongomock_motor
+
+        server.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+        # mongomock ignores partialFilterExpression, so a partial unique index
+        # would reject ordinary rows; leave those indexes out
+        for col_name, indexes in server.INDEXES.items():
+            server.INDEXES[col_name] = [i for i in indexes if "partialFilterExpression" not in i.document]
+    else:
+        server.MONGO_URL = args.mongo_url
+    server.DB_NAME = args.db
+    server.connect()
+    if args.no_cache:
+        # A zero-sized cache stores nothing, so every request is computed
+        server.response_cache = MemoryCache(max_entries=0)
+
+
+async def main_async(args):
+    connect(args)
+    await server.ensure_indexes()
+    results = []
+    try:
+        for size in parse_sizes(args.sizes):
+            started = time.perf_counter()
+            await datagen.generate(**size, seed=args.seed, tenants=args.tenants)
+            print(f"\n== {size} x {args.tenants} tenant(s) (generated in {time.perf_counter() - started:.1f}s)")
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                for label, method, endpoint, make_request in await endpoints(client):
+                    for clients in args.concurrency:
+                        r = await run_endpoint(client, endpoint, clients, args.requests, method, make_request)
+                        r.update(label=label, size=size, tenants=args.tenants, concurrency=clients)
+                        results.append(r)
+                        print(f"{label[:60]:60} c={clients:<3} {r['throughput']:8.1f} req/s "
+                              f"p50 {r['p50_ms']:7.1f} p95 {r['p95_ms']:7.1f} p99 {r['p99_ms']:7.1f} ms")
+    finally:
+        server.disconnect()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "backend": "memory" if args.memory else "mongod",
+        "response_cache": not args.no_cache,
+        "python": platform.python_version(),
+        "requests_per_endpoint": args.requests,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nresults written to {args.output}")
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="finance_bench", help="Scratch database; its contents are replaced")
+    parser.add_argument("--memory", action="store_true", help="Use mongomock-motor instead of a real mongod")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY,
+                        type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and level")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tenants", type=int, default=1, help="Households to generate; requests read the first")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the dashboard response cache")
+    parser.add_argument("--output", default=None, help="Defaults to benchmarks/results/<commit>.json")
+    args = parser.parse_args()
+    if args.output is None:
+        name = git_commit() or datetime.now().strftime("%Y%m%d-%H%M%S")
+        args.output = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{name}.json")
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,7 @@ import Accounts from './components/Accounts';
 import Transactions from './components/Transactions';
 import Checks from './components/Checks';
 import Reports from './components/Reports';
+import { useChangeFeed, patchList } from './utils/changeFeed';
 import './App.css';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
@@ -38,6 +39,23 @@ function App() {
     }
   };
 
+  // Keep accounts and their balances current from the change feed
+  useChangeFeed((event) => {
+    if (event.op === 'resync' && event.entity !== 'check') {
+      fetchAccounts();
+      return;
+    }
+    setAccounts(prev => {
+      let next = event.entity === 'account' ? patchList(prev, event) : prev;
+      if (event.balances) {
+        next = next.map(acc =>
+          acc.id in event.balances ? { ...acc, balance: event.balances[acc.id] } : acc
+        );
+      }
+      return next;
+    });
+  });
+
   const fetchCategories = async () => {
     try {
       const res = await fetch(`${API_URL}/api/categories`);
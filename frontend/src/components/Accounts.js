@@ -8,6 +8,7 @@ import {
   CreditCard
 } from 'lucide-react';
 import { formatToman } from '../utils/format';
+import { isFeedLive } from '../utils/changeFeed';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -92,7 +93,7 @@ function Accounts({ accounts, onRefresh }) {
 
       if (res.ok) {
         setShowModal(false);
-        onRefresh();
+        if (!isFeedLive()) onRefresh();
       }
     } catch (err) {
       console.error('Error saving account:', err);
@@ -109,7 +110,7 @@ function Accounts({ accounts, onRefresh }) {
       const res = await fetch(`${API_URL}/api/accounts/${accountId}`, {
         method: 'DELETE'
       });
-      if (res.ok) {
+      if (res.ok && !isFeedLive()) {
         onRefresh();
       }
     } catch (err) {
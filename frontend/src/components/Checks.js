@@ -12,6 +12,7 @@ import {
   Filter
 } from 'lucide-react';
 import { formatToman, formatJalaliDate, getCurrentJalaliDate } from '../utils/format';
+import { useChangeFeed, isFeedLive, patchList } from '../utils/changeFeed';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -61,6 +62,25 @@ function Checks({ accounts, onRefresh }) {
     setLoading(false);
   };
 
+  const matchesFilters = (check) =>
+    (!filters.account_id || check.account_id === filters.account_id) &&
+    (!filters.type || check.type === filters.type) &&
+    (!filters.status || check.status === filters.status);
+
+  const byDueDate = (a, b) => a.due_date_jalali.localeCompare(b.due_date_jalali);
+
+  useChangeFeed((event) => {
+    if (event.op === 'resync' && event.entity !== 'transaction') {
+      fetchChecks();
+      return;
+    }
+    if (event.entity === 'account' && event.op === 'delete') {
+      setChecks(prev => prev.filter(c => c.account_id !== event.id));
+    } else if (event.entity === 'check') {
+      setChecks(prev => patchList(prev, event, matchesFilters, byDueDate));
+    }
+  });
+
   const openCreateModal = () => {
     setEditingCheck(null);
     setFormData({
@@ -115,8 +135,10 @@ function Checks({ accounts, onRefresh }) {
 
       if (res.ok) {
         setShowModal(false);
-        fetchChecks();
-        onRefresh();
+        if (!isFeedLive()) {
+          fetchChecks();
+          onRefresh();
+        }
       }
     } catch (err) {
       console.error('Error saving check:', err);
@@ -133,7 +155,7 @@ function Checks({ accounts, onRefresh }) {
       const res = await fetch(`${API_URL}/api/checks/${checkId}`, {
         method: 'DELETE'
       });
-      if (res.ok) {
+      if (res.ok && !isFeedLive()) {
         fetchChecks();
         onRefresh();
       }
@@ -149,7 +171,7 @@ function Checks({ accounts, onRefresh }) {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ status: newStatus })
       });
-      if (res.ok) {
+      if (res.ok && !isFeedLive()) {
         fetchChecks();
       }
     } catch (err) {
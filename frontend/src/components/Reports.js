@@ -5,7 +5,8 @@ import {
   TrendingDown,
   PieChart,
   Calendar,
-  RefreshCw
+  RefreshCw,
+  Download
 } from 'lucide-react';
 import {
   Chart as ChartJS,
@@ -38,7 +39,7 @@ const API_URL = process.env.REACT_APP_BACKEND_URL;
 
 function Reports({ accounts }) {
   const [chartData, setChartData] = useState(null);
-  const [transactions, setTransactions] = useState([]);
+  const [balanceHistory, setBalanceHistory] = useState(null);
   const [loading, setLoading] = useState(true);
   const [selectedView, setSelectedView] = useState('monthly');
 
@@ -49,14 +50,12 @@ function Reports({ accounts }) {
   const fetchData = async () => {
     setLoading(true);
     try {
-      const [chartRes, txnRes] = await Promise.all([
+      const [chartRes, historyRes] = await Promise.all([
         fetch(`${API_URL}/api/dashboard/chart-data`),
-        fetch(`${API_URL}/api/transactions`)
+        fetch(`${API_URL}/api/reports/balance-history?interval=month`),
       ]);
-      const chartDataRes = await chartRes.json();
-      const txnData = await txnRes.json();
-      setChartData(chartDataRes);
-      setTransactions(txnData);
+      setChartData(await chartRes.json());
+      setBalanceHistory(await historyRes.json());
     } catch (err) {
       console.error('Error fetching report data:', err);
     }
@@ -64,13 +63,9 @@ function Reports({ accounts }) {
   };
 
   // Calculate totals
-  const totalIncome = transactions
-    .filter(t => t.type === 'income')
-    .reduce((sum, t) => sum + t.amount, 0);
+  const totalIncome = chartData?.totals?.income || 0;
   
-  const totalExpense = transactions
-    .filter(t => t.type === 'expense')
-    .reduce((sum, t) => sum + t.amount, 0);
+  const totalExpense = chartData?.totals?.expense || 0;
 
   // Monthly trend chart
   const monthlyTrendData = {
@@ -95,6 +90,21 @@ function Reports({ accounts }) {
     ],
   };
 
+  // Net worth at the close of each of the last 12 months
+  const balanceHistoryData = {
+    labels: balanceHistory?.series?.map(p => getJalaliMonthName(parseInt(p.date_jalali.split('/')[1], 10))) || [],
+    datasets: [
+      {
+        label: 'موجودی کل',
+        data: balanceHistory?.series?.map(p => p.total_balance / 10) || [],
+        borderColor: '#0F766E',
+        backgroundColor: 'rgba(15, 118, 110, 0.1)',
+        fill: true,
+        tension: 0.4,
+      },
+    ],
+  };
+
   const lineChartOptions = {
     responsive: true,
     maintainAspectRatio: false,
@@ -231,9 +241,29 @@ function Reports({ accounts }) {
 
   return (
     <div data-testid="reports-page">
-      <div className="page-header">
-        <h1 className="page-title">گزارش‌ها</h1>
-        <p className="page-subtitle">تحلیل وضعیت مالی شما</p>
+      <div className="page-header flex items-center justify-between">
+        <div>
+          <h1 className="page-title">گزارش‌ها</h1>
+          <p className="page-subtitle">تحلیل وضعیت مالی شما</p>
+        </div>
+        <div className="flex gap-2">
+          <a
+            className="btn btn-secondary"
+            href={`${API_URL}/api/transactions/export?format=xlsx`}
+            data-testid="export-transactions-btn"
+          >
+            <Download size={18} />
+            خروجی تراکنش‌ها
+          </a>
+          <a
+            className="btn btn-secondary"
+            href={`${API_URL}/api/checks/export?format=xlsx`}
+            data-testid="export-checks-btn"
+          >
+            <Download size={18} />
+            خروجی چک‌ها
+          </a>
+        </div>
       </div>
 
       {/* Summary Cards */}
@@ -304,6 +334,17 @@ function Reports({ accounts }) {
         </div>
       </div>
 
+      {/* Balance History */}
+      <div className="chart-container mb-6" data-testid="balance-history-chart">
+        <h3 className="chart-title flex items-center gap-2">
+          <TrendingUp size={18} className="text-primary" />
+          روند موجودی ۱۲ ماهه اخیر (تومان)
+        </h3>
+        <div style={{ height: '280px' }}>
+          <Line data={balanceHistoryData} options={lineChartOptions} />
+        </div>
+      </div>
+
       {/* Bottom Section */}
       <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
         {/* Income vs Expense */}
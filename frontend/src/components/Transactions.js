@@ -10,19 +10,23 @@ import {
   Filter
 } from 'lucide-react';
 import { formatToman, formatJalaliDate, getCurrentJalaliDate } from '../utils/format';
+import { useChangeFeed, isFeedLive, patchList } from '../utils/changeFeed';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
 function Transactions({ accounts, categories, onRefresh }) {
   const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [showModal, setShowModal] = useState(false);
   const [editingTransaction, setEditingTransaction] = useState(null);
   const [loading, setLoading] = useState(true);
   const [filters, setFilters] = useState({
     account_id: '',
     type: '',
-    category: ''
+    category: '',
+    q: ''
   });
+  const [search, setSearch] = useState('');
   const [formData, setFormData] = useState({
     account_id: '',
     type: 'expense',
@@ -36,23 +40,69 @@ function Transactions({ accounts, categories, onRefresh }) {
     fetchTransactions();
   }, [filters]);
 
-  const fetchTransactions = async () => {
+  // Wait for a pause in typing before querying
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setFilters(prev => prev.q === search.trim() ? prev : { ...prev, q: search.trim() });
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  const fetchTransactions = async (cursor = null) => {
     setLoading(true);
     try {
       const params = new URLSearchParams();
       if (filters.account_id) params.append('account_id', filters.account_id);
       if (filters.type) params.append('type', filters.type);
       if (filters.category) params.append('category', filters.category);
+      if (filters.q) params.append('q', filters.q);
+      if (cursor) params.append('cursor', cursor);
 
       const res = await fetch(`${API_URL}/api/transactions?${params}`);
       const data = await res.json();
-      setTransactions(data);
+      setTransactions(prev => {
+        if (!cursor) return data.items;
+        // Rows inserted through the change feed may reappear on the next page
+        const seen = new Set(prev.map(t => t.id));
+        return [...prev, ...data.items.filter(t => !seen.has(t.id))];
+      });
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error('Error fetching transactions:', err);
     }
     setLoading(false);
   };
 
+  const matchesFilters = (txn) =>
+    (!filters.account_id || txn.account_id === filters.account_id) &&
+    (!filters.type || txn.type === filters.type) &&
+    (!filters.category || txn.category === filters.category);
+
+  // Newest first, like the API's (date, id) ordering
+  const byDateDesc = (a, b) => (b.date + b.id).localeCompare(a.date + a.id);
+
+  useChangeFeed((event) => {
+    if (event.op === 'resync' && event.entity !== 'check') {
+      fetchTransactions();
+      return;
+    }
+    if (event.entity === 'account' && event.op === 'delete') {
+      setTransactions(prev => prev.filter(t => t.account_id !== event.id));
+    } else if (event.entity === 'transaction') {
+      // Search ranking happens on the server; only patch rows already shown
+      if (filters.q) {
+        if (event.op !== 'insert') setTransactions(prev => patchList(prev, event, matchesFilters));
+        return;
+      }
+      setTransactions(prev => {
+        // Rows older than the loaded pages arrive with "load more"
+        const oldest = prev[prev.length - 1];
+        const loaded = (txn) => !nextCursor || !oldest || txn.date >= oldest.date;
+        return patchList(prev, event, (txn) => matchesFilters(txn) && loaded(txn), byDateDesc);
+      });
+    }
+  });
+
   const openCreateModal = () => {
     setEditingTransaction(null);
     setFormData({
@@ -107,8 +157,10 @@ function Transactions({ accounts, categories, onRefresh }) {
 
       if (res.ok) {
         setShowModal(false);
-        fetchTransactions();
-        onRefresh();
+        if (!isFeedLive()) {
+          fetchTransactions();
+          onRefresh();
+        }
       }
     } catch (err) {
       console.error('Error saving transaction:', err);
@@ -125,7 +177,7 @@ function Transactions({ accounts, categories, onRefresh }) {
       const res = await fetch(`${API_URL}/api/transactions/${transactionId}`, {
         method: 'DELETE'
       });
-      if (res.ok) {
+      if (res.ok && !isFeedLive()) {
         fetchTransactions();
         onRefresh();
       }
@@ -190,6 +242,14 @@ function Transactions({ accounts, categories, onRefresh }) {
             <option key={cat} value={cat}>{cat}</option>
           ))}
         </select>
+        <input
+          type="search"
+          className="filter-select"
+          placeholder="جستجو در شرح و دسته‌بندی"
+          value={search}
+          onChange={e => setSearch(e.target.value)}
+          data-testid="filter-search"
+        />
       </div>
 
       {/* Transactions List */}
@@ -274,6 +334,18 @@ function Transactions({ accounts, categories, onRefresh }) {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <div className="flex justify-center p-4">
+              <button
+                className="btn btn-secondary"
+                onClick={() => fetchTransactions(nextCursor)}
+                disabled={loading}
+                data-testid="load-more-transactions-btn"
+              >
+                {loading ? 'در حال بارگذاری...' : 'نمایش بیشتر'}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
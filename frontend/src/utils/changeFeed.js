@@ -0,0 +1,54 @@
+// Shared subscription to the backend change feed (/api/events)
+import { useEffect, useRef } from 'react';
+
+const API_URL = process.env.REACT_APP_BACKEND_URL;
+
+const listeners = new Set();
+let source = null;
+
+const connect = () => {
+  if (source || typeof EventSource === 'undefined') return;
+  source = new EventSource(`${API_URL}/api/events`);
+  source.onmessage = (e) => {
+    const event = JSON.parse(e.data);
+    if (event.op === 'ready') return;
+    listeners.forEach((listener) => listener(event));
+  };
+};
+
+const disconnect = () => {
+  if (source && listeners.size === 0) {
+    source.close();
+    source = null;
+  }
+};
+
+// True while events are flowing; callers refetch themselves otherwise
+export const isFeedLive = () => source !== null && source.readyState === EventSource.OPEN;
+
+// Call `handler` with every change event while the component is mounted
+export const useChangeFeed = (handler) => {
+  const handlerRef = useRef(handler);
+  handlerRef.current = handler;
+
+  useEffect(() => {
+    const listener = (event) => handlerRef.current(event);
+    listeners.add(listener);
+    connect();
+    return () => {
+      listeners.delete(listener);
+      disconnect();
+    };
+  }, []);
+};
+
+// Apply an insert/update/delete event to a list of rows keyed by id.
+// `keep` decides whether a row belongs in the list (e.g. active filters)
+// and `compare` restores its sort order.
+export const patchList = (rows, event, keep = () => true, compare = null) => {
+  const others = rows.filter((row) => row.id !== event.id);
+  if (event.op === 'delete' || !event.doc || !keep(event.doc)) return others;
+  if (event.op === 'update' && others.length === rows.length) return rows;
+  const next = [...others, event.doc];
+  return compare ? next.sort(compare) : next;
+};